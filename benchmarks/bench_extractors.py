@@ -0,0 +1,70 @@
+'''
+Compare the HTML extraction backends on saved mediavida pages.
+
+Usage: python benchmarks/bench_extractors.py page1.html [page2.html ...] [--rounds N]
+'''
+import argparse
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import modules.extractors as extractors
+
+
+def time_backend(backend, pages:list, rounds:int) -> tuple:
+    """Time a full extraction (posts and page count) of every page.
+
+    Args:
+        backend: The extraction backend to time.
+        pages (list): The HTML text of the saved pages.
+        rounds (int): How many times each page is parsed.
+
+    Returns:
+        tuple: The mean seconds per page and the posts extracted on the last round.
+    """
+    start = time.perf_counter()
+
+    for _ in range(rounds):
+        results = [(backend.extract_posts(page), backend.extract_page_count(page)) for page in pages]
+
+    elapsed = time.perf_counter() - start
+
+    return (elapsed / (rounds * len(pages)), results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTML extraction backends.")
+    parser.add_argument("pages", nargs="+", help="Saved HTML pages from mediavida.com")
+    parser.add_argument("--rounds", type=int, default=20, help="Times each page is parsed")
+    args = parser.parse_args()
+
+    pages = list()
+
+    for page_file in args.pages:
+        with open(page_file, encoding="utf-8") as html:
+            pages.append(html.read())
+
+    reference = None
+
+    for name, backend_class in extractors.BACKENDS.items():
+        try:
+            backend = backend_class()
+        except ImportError:
+            print(f"{name:>6}: not installed")
+            continue
+
+        per_page, results = time_backend(backend, pages, args.rounds)
+
+        if reference is None:
+            reference = results
+            same_output = "reference"
+        else:
+            same_output = "same output" if results == reference else "DIFFERENT OUTPUT"
+
+        print(f"{name:>6}: {per_page * 1000:8.2f} ms/page ({same_output})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+'''
+Compare the vote history deduplication against the previous full-table scan,
+on a synthetic multi-day history.
+
+Usage: python benchmarks/bench_vote_history.py [--rows 30000] [--votes 500]
+'''
+import argparse
+import os
+import os.path
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pandas as pd
+
+import vote_count
+
+
+def build_history(rows:int, players:list) -> pd.DataFrame:
+    """Build a random vote history with the vote_history.csv layout."""
+    history = list()
+
+    for post_id in range(1, rows + 1):
+        voter, victim = random.sample(players, 2)
+        history.append({"player": victim, "public_name": victim.capitalize(),
+                        "voted_by": voter, "voted_as": voter.capitalize(),
+                        "post_id": post_id, "post_time": 1600000000 + post_id * 60,
+                        "bot_cycle": post_id // 30, "unvoted_at": 0})
+
+    return pd.DataFrame(history)
+
+
+def scan_dedup(history:pd.DataFrame, last_vote:pd.Series, bot_cycle:int) -> pd.DataFrame:
+    """The previous deduplication: compare the vote against every history row."""
+    columns_to_check = ['player', 'public_name', 'voted_by', 'voted_as', 'post_id', 'post_time']
+
+    already_appended = (history[columns_to_check] == last_vote[columns_to_check]).all(axis=1)
+    same_cycle       = (history[already_appended]['bot_cycle'] == bot_cycle).any()
+
+    if not already_appended.any() or same_cycle:
+        history = pd.concat([history, last_vote.to_frame().T], ignore_index=True)
+
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vote history deduplication.")
+    parser.add_argument("--rows", type=int, default=30000, help="Rows of the synthetic history")
+    parser.add_argument("--votes", type=int, default=500, help="Votes replayed against it")
+    args = parser.parse_args()
+
+    players = [f"player{i}" for i in range(16)]
+    history = build_history(args.rows, players)
+
+    # Replay the last votes of the history, as a restart would do
+    replayed = [history.iloc[i].drop("unvoted_at").to_dict() for i in range(args.rows - args.votes, args.rows)]
+    cycle    = int(history["bot_cycle"].max()) + 1
+
+    start = time.perf_counter()
+    scanned = history
+    for vote in replayed:
+        scanned = scan_dedup(scanned, pd.Series({**vote, "unvoted_at": 0}), cycle)
+    scan_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as workdir:
+        old_dir = os.getcwd()
+        os.chdir(workdir)
+
+        try:
+            history.to_csv("vote_history.csv", sep=",", index=False)
+            pd.DataFrame({"player": players, "can_be_voted": 1, "allowed_votes": 1,
+                          "mod_to_lynch": 0, "is_mayor": 0}).to_csv("vote_config.csv", sep=",", index=False)
+
+            vcount = vote_count.VoteCount(staff=[], day_start_post=1, bot_cycle=cycle, n_players=len(players))
+
+            start = time.perf_counter()
+            for vote in replayed:
+                vcount._update_vote_history(last_vote=vote)
+            indexed_rows = len(vcount._vote_history)
+            index_time = time.perf_counter() - start
+        finally:
+            os.chdir(old_dir)
+
+    print(f"History of {args.rows} rows, {args.votes} replayed votes")
+    print(f"   scan: {scan_time * 1000 / args.votes:8.3f} ms/vote ({len(scanned)} rows)")
+    print(f"indexed: {index_time * 1000 / args.votes:8.3f} ms/vote ({indexed_rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
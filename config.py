@@ -23,6 +23,15 @@ class Config:
         self.votes_until_update = 10
         self.reveal_day_kill, self.reveal_eod_lynch, self.reveal_lynch = False,False,False
         self.day_duration, self.night_duration = 48, 24
+        self.request_timeout    = 10
+        self.request_retries    = 3
+        self.max_concurrent_requests = 4
+        self.html_backend       = "auto"
+        self.min_update_time    = 15
+        self.max_update_time    = 600
+        self.capture_dir        = ""
+        self.dry_run            = False
+        self.replay_clock_url   = ""
 
         self._config_file = file_to_load
         self._raw_config  = self._load_file(self._config_file)
@@ -84,8 +93,26 @@ class Config:
             self.night_duration = abs(float(raw_config.loc["night_hours", "value"]))
             self.stage_start_time = pd.to_datetime(raw_config.loc["stage_start_time", "value"], format="%H:%M:%S").time()
 
+            self.request_timeout = abs(float(self._get_optional(raw_config, "request_timeout_seconds", self.request_timeout)))
+            self.request_retries = abs(int(self._get_optional(raw_config, "request_retries", self.request_retries)))
+            self.max_concurrent_requests = max(1, int(self._get_optional(raw_config, "max_concurrent_requests", self.max_concurrent_requests)))
+            self.html_backend = str(self._get_optional(raw_config, "html_backend", self.html_backend)).strip().lower()
+
+            self.min_update_time = int(self._get_optional(raw_config, "min_update_time_seconds", self.min_update_time))
+            self.max_update_time = int(self._get_optional(raw_config, "max_update_time_seconds", self.max_update_time))
+
+            self.capture_dir      = str(self._get_optional(raw_config, "capture_dir", self.capture_dir)).strip()
+            self.dry_run          = bool(int(self._get_optional(raw_config, "dry_run", self.dry_run)))
+            self.replay_clock_url = str(self._get_optional(raw_config, "replay_clock_url", self.replay_clock_url)).strip()
+
             if self.update_time < 10:
                 self.update_time = 10
+
+            if self.min_update_time < 10:
+                self.min_update_time = 10
+
+            if self.max_update_time < self.update_time:
+                self.max_update_time = self.update_time
             
             if self.posts_until_update <= 0:
                 self.posts_until_update = -1
@@ -104,4 +131,18 @@ class Config:
                 sys.exit("ERROR: Config could not be parsed")
 
 
+    def _get_optional(self, raw_config: pd.DataFrame, key:str, default):
+        """Get the value of an optional config key.
 
+        Args:
+            raw_config (pd.DataFrame): The key-value config dataframe.
+            key (str): The key to look for.
+            default: The value to use if the key is missing or empty.
+
+        Returns:
+            The raw value for the key, or the default.
+        """
+        if key in raw_config.index and pd.notna(raw_config.loc[key, "value"]):
+            return raw_config.loc[key, "value"]
+        else:
+            return default
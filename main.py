@@ -1,7 +1,7 @@
+import asyncio
 import datetime
 import logging
 import os.path
-import time
 import sys
 
 import pandas as pd
@@ -12,15 +12,30 @@ import user
 import vote_count
 import player_list as pl
 import modules.thread_reader as tr
+from modules.action_journal import ActionJournal
+from modules.bot_index import BotPostIndex
+from modules.name_registry import NameRegistry
+from modules.phase_tracker import PhaseTracker
+from modules.scan_cursor import ScanCursor
+from modules.scheduler import PollScheduler
+import modules.extractors as extractors
+import modules.replay as replay
+import modules.snapshot as snapshot
+from modules.fetcher import fetcher
+from modules.game_store import GameStore, store
+from modules.posting_client import posting_client
+from modules.outbox import outbox
 import states.stage as stages
 import states.action as actions
 
 def main():
+    """Run every game given in the command line, i.e. main.py game_a/config.csv game_b/config.csv.
+    Each game keeps its files next to its config file. Without arguments, the
+    bot runs the game of config.csv in the current folder.
+    """
 
     ## SETUP GLOBAL VARIABLES ##
-    global majority_reached
-    global settings
-    global staff
+    global replay_clock
 
     ### SETUP UP PROGRAM LEVEL LOGGER ###
     logger = logging.getLogger("mafia_bot")
@@ -35,407 +50,686 @@ def main():
     logging.getLogger("requests").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
 
-    settings           = config.Config(file_to_load='config.csv')
-    majority_reached   =  False
-    
-    ## DEFINE STAFF MEMBERS ##
-    staff = list(map(str.lower, settings.moderators))
-    staff.append(settings.game_master.lower())
+    config_files = sys.argv[1:] if len(sys.argv) > 1 else ['config.csv']
+    games        = [config.Config(file_to_load=config_file) for config_file in config_files]
+
+    ## Process wide services are set up from the first game
+    settings = games[0]
+
+    ## All the games share the same pooled HTTP session
+    fetcher.configure(timeout=max(game.request_timeout for game in games),
+                      retries=max(game.request_retries for game in games),
+                      pool_size=max(10, sum(game.max_concurrent_requests for game in games)))
+
+    extractors.use_backend(settings.html_backend)
+
+    ## Every post goes through a single logged in session, fed by the outbox.
+    ## The games look for the bot posts of that account.
+    if any(game.mediavida_user.lower() != settings.mediavida_user.lower() for game in games):
+        logging.warning(f"Every game posts as {settings.mediavida_user}. Ignoring the other bot accounts.")
+
+    posting_client.configure(user=settings.mediavida_user, password=settings.mediavida_pwd)
+    outbox.start(posting_client.post)
 
-    run(settings.update_time)
+    ## Record and replay support
+    if settings.capture_dir:
+        replay.start_capture(settings.capture_dir)
 
+    replay_clock = replay.ReplayClock(settings.replay_clock_url) if settings.replay_clock_url else None
 
-def run(update_tick: int):
-    """Main bot loop. It iterates each N seconds, as defined by the config file. 
-    For each iteration, it parses the game thread if we are on day phase, 
-    then collects and resolves all the game actions and decide 
-    if a new vote count should be pushed.
+    asyncio.run(run_games(settings=games, game_dirs=[os.path.dirname(config_file) for config_file in config_files]))
+
+
+async def run_games(settings: list, game_dirs: list):
+    """Run several games on the same event loop until all of them end.
 
     Args:
-        update_tick (int): Seconds to pass between bot iterations.
+        settings (list): The config of each game.
+        game_dirs (list): The folder of each game.
     """
+    await asyncio.gather(*[run_game(Game(settings=game_settings, game_dir=game_dir, bot_id=settings[0].mediavida_user))
+                           for game_settings, game_dir in zip(settings, game_dirs)])
 
-    ## Attempt to recover the last bot cycle just in case of an unexpected
-    ## crash. Needed for the vhistory to work correctly.
-    bot_cycles = get_last_bot_cycle()
 
-    ## check if this is the first bot activation. Don't trust cycles
-    if bot_cycles == 0:
-        announce_bot_activation()
+async def run_game(game):
+    """Main bot loop of a game. Each iteration runs in a worker thread, so the
+    other games keep running while this one waits for the forum. Between
+    iterations, the game sleeps for the interval picked by its scheduler.
+    A failed iteration is retried after the base interval. The loop only
+    stops when the game ends.
 
-    while(True):
+    Args:
+        game (Game): The game to run.
+    """
+    loop    = asyncio.get_running_loop()
+    started = False
 
+    while True:
+        try:
+            if not started:
+                await loop.run_in_executor(None, game.start)
+                started = True
 
-        update_tick     = settings.update_time
+            update_tick = await loop.run_in_executor(None, game.tick)
 
-        game_status     = tr.get_game_phase(game_thread=settings.game_thread, game_master=settings.game_master)
+        except Exception:
+            logging.exception(f"Bot iteration of {game.settings.game_thread} failed. Retrying in {game.settings.update_time} seconds.")
+            update_tick = game.settings.update_time
 
-        if game_status.game_stage == stages.Stage.Day:
+        if update_tick is None:
+            break
 
-            current_day_start_post = game_status.stage_start_post
+        # Replays run on a faster simulated clock
+        await asyncio.sleep(update_tick / replay_clock.speed if replay_clock is not None else update_tick)
 
-            ## Set the duration of the day phase
-            game_status.set_stage_duration(stage_hours = settings.day_duration)
-            ## Set the stage start time
-            game_status.set_stage_start_hour(stage_start=settings.stage_start_time)
-            
-            player_list    = tr.get_player_list(game_thread=settings.game_thread,
-                                        start_day_post_id=current_day_start_post
-                                        )
+    ## Let the outbox post anything still queued
+    await loop.run_in_executor(None, outbox.wait_until_empty, 60)
 
-            Players = pl.Players(player_list, bot_cycles)
 
-            VoteCount              = vote_count.VoteCount(staff=staff,
-                                                          day_start_post=current_day_start_post,
-                                                          bot_cycle=bot_cycles,
-                                                          n_players=len(Players.players)
-                                                          )
+class Game:
 
-            print('We are on day time!')
+    def __init__(self, settings: config.Config, game_dir: str = "", bot_id: str = None):
+        """State of a single game: its config, its staff, its game tables and
+        the day state kept alive between iterations.
 
-            last_votecount = tr.get_last_votecount(game_thread=settings.game_thread,
-                                                   bot_id=settings.mediavida_user)
+        Args:
+            settings (config.Config): The game config.
+            game_dir (str, optional): The folder with the game files. Defaults to the current folder.
+            bot_id (str, optional): The account posting the bot messages. Defaults to the game config account.
+        """
+        self.settings         = settings
+        self.majority_reached = False
 
-            last_votecount_id = last_votecount[0]
-            majority_reached  = last_votecount[1]
+        ## DEFINE STAFF MEMBERS ##
+        self.staff = list(map(str.lower, settings.moderators))
+        self.staff.append(settings.game_master.lower())
 
-            if last_votecount_id < current_day_start_post and majority_reached:
-                majority_reached = False            
+        self.store = GameStore(db_file=os.path.join(game_dir, "game_state.db"))
+
+        ## Game state kept alive between iterations of the same day
+        self.Players   = None
+        self.VoteCount = None
+        self.names     = None
+        self.cursor_file = os.path.join(game_dir, "scan_cursor.csv")
+        self.cursor      = ScanCursor(file_to_load=self.cursor_file)
+        self.journal   = ActionJournal(file_to_load=os.path.join(game_dir, "action_journal.jsonl"))
 
-            if not majority_reached:
+        ## Set when the day state has to be rebuilt from the action journal
+        self.replay_journal = False
+        self.bot_cycles     = 0
 
-                last_thread_post  = tr.get_last_post(game_thread=settings.game_thread)
+        self.bot_index = BotPostIndex(game_thread=settings.game_thread, bot_id=bot_id or settings.mediavida_user)
+        self.phases    = PhaseTracker(game_thread=settings.game_thread, game_master=settings.game_master)
+        self.scheduler = PollScheduler(base_interval=settings.update_time,
+                                       min_interval=settings.min_update_time,
+                                       max_interval=settings.max_update_time)
 
-                logging.info(f'Starting vote count. Last vote count: {last_votecount_id}. Last reply: {last_thread_post}')
 
-                start_page = tr.get_page_number_from_post(current_day_start_post)
-                page_count = tr.request_page_count(game_thread=settings.game_thread)
+    def start(self):
+        """Recover the game state of a previous run, if any."""
+        with store.using(self.store):
 
-                logging.info(f'Detected day start at page: {start_page}')
-                logging.info(f'Detected {page_count} pages')
+            ## Attempt to recover the last bot cycle just in case of an unexpected
+            ## crash. Needed for the vhistory to work correctly.
+            self.bot_cycles = self.get_last_bot_cycle()
 
-                for cur_page in range(start_page, (page_count + 1)):
+            ## check if this is the first bot activation. Don't trust cycles
+            if self.bot_cycles == 0:
+                self.announce_bot_activation()
 
-                    logging.info(f'Checking page: {cur_page}')
+            ## Resume the day from the last snapshot after a restart
+            self.restore()
 
-                    action_queue = tr.get_actions_from_page(game_thread = settings.game_thread,
-                                                            page_to_scan = cur_page,
-                                                            start_from_post = current_day_start_post)
 
-                    logging.info(f'Retrieved {len(action_queue)} actions for page {cur_page}')
+    def restore(self):
+        """Load the day state of the last snapshot, if any. The day is rebuilt
+        from scratch on the next iteration otherwise.
+        """
+        self.Players, self.VoteCount, self.names = None, None, None
+        self.cursor = ScanCursor(file_to_load=self.cursor_file)
 
-                    resolve_action_queue(queue=action_queue,
-                    vcount=VoteCount,
-                    Players=Players,
-                    last_count=last_votecount_id,
-                    day_start = current_day_start_post,
-                    eod_time=game_status.get_end_of_stage()
-                    )
+        saved_state = snapshot.load_snapshot()
 
-                ## Check If there is still time left to play. Otherwise, start the EoD
-                if game_status.is_end_of_stage(current_time = get_current_ntp_time()) and not majority_reached:
-                    
-                    last_valid_action = [action for action in action_queue if action.post_time < game_status.get_end_of_stage()].pop()
-                    majority_reached = True ## This will stop the bot in the next iteration
-                    logging.info("EoD detected. Pushing last valid votecount and preparing flip routine")
+        if saved_state is not None:
+            self.cursor = saved_state["cursor"]
 
-                    end_of_day_victim = VoteCount.get_current_lynch_candidate()
-                    lynch_is_revealed = settings.reveal_eod_lynch
+            ## The game tables come from the store. Only the day state was saved.
+            self.build_day(players=saved_state["players"]["players"], day_start_post=self.cursor.day_start_post)
+            self.Players.set_day_state(saved_state["players"])
+            self.VoteCount.set_day_state(saved_state["vote_count"])
 
-                    if end_of_day_victim is None or end_of_day_victim == "no_lynch" or not lynch_is_revealed:
-                        role_to_reveal = None
-                    else:
-                        role_to_reveal = f"{Players.get_player_role(end_of_day_victim)} - {Players.get_player_team(end_of_day_victim)}"
-
-                    User = user.User(config=settings)
-                    User.push_lynch(
-                        last_votecount=VoteCount._vote_table,
-                        victim=end_of_day_victim,
-                        post_id=last_valid_action.id,
-                        reveal=role_to_reveal,
-                        is_eod=True
-                        )
+            logging.info(f"Resumed the game state at post {self.cursor.last_post}")
 
-                    majority_reached = True
 
-                ## get votes casted since last update
-                votes_since_update = len(VoteCount._vote_table[VoteCount._vote_table['post_id'] > last_votecount_id].index)
+    def build_day(self, players: list, day_start_post: int):
+        """Load the players and the vote count of a day from the game tables.
 
-                should_update =  update_thread_vote_count(last_count=last_votecount_id,
-                                                          last_post=last_thread_post,
-                                                          votes_since_update=votes_since_update
-                                                          )     
-                
-                if should_update:
-                    logging.info('Pushing a new votecount')
-                    push_vote_count(vote_table=VoteCount._vote_table,
-                                    alive_players=Players.players,
-                                    last_parsed_post=last_thread_post,
-                                    current_majority=VoteCount.current_majority
-                                    )
-                else:
-                    logging.info('Recent votecount detected. ')
+        Args:
+            players (list): The players of the day.
+            day_start_post (int): The post id where the day was announced.
+        """
+        ## Display names of the day, shared by the players, the vote count and the bot messages
+        self.names     = NameRegistry(players=store.load_table("vote_config")["player"].tolist(), staff=self.staff)
+        self.Players   = pl.Players(players, self.bot_cycles, names=self.names)
+        self.VoteCount = vote_count.VoteCount(staff=self.staff,
+                                              day_start_post=day_start_post,
+                                              bot_cycle=self.bot_cycles,
+                                              n_players=len(self.Players.players),
+                                              names=self.names
+                                              )
+
+
+    def reload_day(self):
+        """Load the game tables of the current day again, keeping its day state."""
+        players_state    = self.Players.get_day_state()
+        vote_count_state = self.VoteCount.get_day_state()
+
+        self.build_day(players=players_state["players"], day_start_post=self.VoteCount.day_start_post)
+        self.Players.set_day_state(players_state)
+        self.VoteCount.set_day_state(vote_count_state)
+
+
+    def tick(self) -> float:
+        """Run a bot iteration. It parses the game thread if we are on day phase, 
+        then collects and resolves the game actions posted since the last iteration
+        and decide if a new vote count should be pushed.
+
+        Returns:
+            float: Seconds to wait until the next iteration, adapting the config interval
+            to the thread activity and the game phase. None once the game has ended.
+        """
+        with store.using(self.store):
+            try:
+                return self._tick()
+            except Exception:
+                ## Drop the half resolved iteration and resume from the last snapshot
+                self.store.rollback()
+                self.restore()
+                raise
+
+
+    def _tick(self) -> float:
+        settings  = self.settings
+        cursor    = self.cursor
+        journal   = self.journal
+        bot_index = self.bot_index
+
+        ## Nothing is expected to happen unless we are in the middle of a day
+        is_idle         = True
+        stage_end       = None
+
+        ## The clock is read once per iteration
+        current_time    = get_current_ntp_time()
+
+        ## Let the GM know about the messages the forum rejected since the last iteration
+        user.User(config=settings, names=self.names).push_rejected_posts()
+
+        ## Pick up the setup tables edited by the GM, keeping the day state
+        if len(store.reload_edited_tables()) > 0 and self.VoteCount is not None:
+            self.reload_day()
+
+        ## Each url is downloaded at most once per iteration
+        fetcher.begin_tick()
+
+        try:
+            game_status     = self.phases.get_game_phase()
+            self.scheduler.set_stage(game_status.stage_start_post)
+
+            if game_status.game_stage == stages.Stage.Day:
+
+                current_day_start_post = game_status.stage_start_post
+
+                ## Set the duration of the day phase
+                game_status.set_stage_duration(stage_hours = settings.day_duration)
+                ## Set the stage start time
+                game_status.set_stage_start_hour(stage_start=settings.stage_start_time)
                 
-            else:
-                logging.info('Majority already reached. Skipping...')   
+                ## The day state is built once per day. Later iterations resume it
+                ## from the scan cursor instead of replaying the whole day.
+                if self.VoteCount is None or not cursor.is_on_day(current_day_start_post):
 
-            # Save the vote history for the next iteration
-            VoteCount.save_vote_history()
+                    player_list    = tr.get_player_list(game_thread=settings.game_thread,
+                                                start_day_post_id=current_day_start_post
+                                                )
 
-        elif game_status.game_stage  == stages.Stage.Night:
-            game_status.set_stage_duration(stage_hours = settings.night_duration)
-            logging.info('Night phase detected. Skipping...')
-            print('We are on night phase!')
+                    self.build_day(players=player_list, day_start_post=current_day_start_post)
+                    cursor.reset(day_start_post=current_day_start_post)
+                    self.replay_journal = True
+                else:
+                    self.Players.bot_cycle          = self.bot_cycles
+                    self.VoteCount.bot_cycle        = self.bot_cycles
+                    self.VoteCount.current_majority = self.VoteCount.get_vote_majority(n_players=len(self.Players.players))
 
-        #TODO: Exit routine here
-        elif game_status.game_stage == stages.Stage.End:
-            
-            print('Game ended!')
-            logging.info(f'Game ended. Exiting now')
-            time.sleep(5)
-            sys.exit()
+                Players   = self.Players
+                VoteCount = self.VoteCount
 
-        logging.info(f'Sleeping for {update_tick} seconds.')  
+                print('We are on day time!')
 
-        print(f'Sleeping for {update_tick} seconds.')
+                ## Index the messages pushed by the bot since the last iteration
+                bot_index.update()
 
-        bot_cycles += 1
-        time.sleep(update_tick)
+                last_votecount = bot_index.get_last_votecount()
 
+                last_votecount_id     = last_votecount[0]
+                self.majority_reached = last_votecount[1]
 
-#TODO: Handle actual permissions without a giant if/else
-#TODO: This func. is prime candidate for refactoring
-def resolve_action_queue(queue: list, vcount: vote_count.VoteCount, Players: pl.Players, last_count:int, day_start:int, eod_time:int):
-    '''
-    Parameters:  \n
-    queue: A list of game actions.\n
-    vcount: The current Vote Count.\n
-    '''
+                if last_votecount_id < current_day_start_post and self.majority_reached:
+                    self.majority_reached = False            
 
-    User    = user.User(config=settings)
-    allowed_actors = Players.players + staff
+                ## A lynch still waiting in the outbox is not on the forum yet
+                self.majority_reached = self.majority_reached or VoteCount.majority_reached
 
-    for game_action in queue:
+                if not self.majority_reached:
 
-        ## Ignore actions out of EoD except those coming from the staff
-        if game_action.post_time >= eod_time and game_action.author not in staff:
-            continue
+                    last_thread_post  = tr.get_last_post(game_thread=settings.game_thread)
+                    self.scheduler.record_activity(last_post=last_thread_post, current_time=current_time)
 
-        if game_action.author in allowed_actors:
+                    logging.info(f'Starting vote count. Last vote count: {last_votecount_id}. Last reply: {last_thread_post}')
 
-            if game_action.type == actions.Action.vote and (Players.player_exists(game_action.victim) or game_action.victim == "no_lynch"):
+                    eod_time   = game_status.get_end_of_stage()
 
-                vcount.vote_player(action=game_action)
+                    ## Rebuild the day from the local journal. The forum is only read for newer posts.
+                    if self.replay_journal:
+                        journaled_queue = journal.get_actions(since_post=current_day_start_post)
 
-                if vcount.is_lynched(victim=game_action.victim):
+                        logging.info(f'Replaying {len(journaled_queue)} journaled actions of the day')
 
-                    global majority_reached
-                    majority_reached = True
+                        self.resolve_action_queue(queue=journaled_queue,
+                        vcount=VoteCount,
+                        Players=Players,
+                        last_count=last_votecount_id,
+                        day_start = current_day_start_post,
+                        eod_time=eod_time,
+                        bot_index=bot_index
+                        )
 
-                    User.push_lynch(last_votecount=vcount._vote_table,
-                                    victim=game_action.victim,
-                                    post_id=game_action.id,
-                                    reveal=f"{Players.get_player_role(game_action.victim)} - {Players.get_player_team(game_action.victim)}"
-                    )
-                    break
+                        for action in journaled_queue:
+                            if action.post_time < eod_time:
+                                cursor.last_valid_action = max(cursor.last_valid_action, action.id)
 
-            elif game_action.type == actions.Action.unvote:
-                vcount.unvote_player(action=game_action)
-            
-            elif game_action.type == actions.Action.lylo:
+                        if len(journaled_queue) > 0:
+                            cursor.advance(journaled_queue[-1].id)
 
-                logging.info(f'{game_action.author} requested an vcount lock at  {game_action.id}')
+                        self.replay_journal = False
 
-                if game_action.author in staff:
-                    vcount.lock_unvotes()
+                    start_page = cursor.last_page
+                    page_count = tr.request_page_count(game_thread=settings.game_thread)
 
-            elif game_action.type == actions.Action.replace_player and game_action.author in staff:
+                    logging.info(f'Resuming day scan after post {cursor.last_post} at page: {start_page}')
+                    logging.info(f'Detected {page_count} pages')
 
-                Players.replace_player(player_out = game_action.actor,player_in = game_action.victim)
-                vcount.replace_player(replaced=game_action.actor, replaced_by=game_action.victim)
-                allowed_actors.remove(game_action.actor)
+                    ## Pages are fetched concurrently but resolved in post order
+                    pages_to_scan = list(range(start_page, (page_count + 1)))
+                    page_queues   = tr.get_actions_from_pages(game_thread = settings.game_thread,
+                                                              pages_to_scan = pages_to_scan,
+                                                              start_from_post = cursor.last_post,
+                                                              max_workers = settings.max_concurrent_requests)
 
-                if game_action.victim not in allowed_actors:
-                    allowed_actors.append(game_action.victim)
- 
-            elif game_action.type == actions.Action.modkill or game_action.type == actions.Action.kill or game_action.type == actions.Action.winner:
-                if game_action.author in staff:
-                    Players.remove_player(game_action.victim)
-                    vcount.remove_player(game_action.victim)
-                   
-            elif game_action.type == actions.Action.vote_history or game_action.type == actions.Action.get_voters:
+                    for cur_page, action_queue in zip(pages_to_scan, page_queues):
 
-                real_names = vcount.get_real_names()
+                        logging.info(f'Retrieved {len(action_queue)} actions for page {cur_page}')
 
-                # get key, default
-                game_action.victim = real_names.get(game_action.victim, game_action.victim)
+                        journal.append(action_queue)
 
-                if game_action.type == actions.Action.vote_history:
+                        self.resolve_action_queue(queue=action_queue,
+                        vcount=VoteCount,
+                        Players=Players,
+                        last_count=last_votecount_id,
+                        day_start = current_day_start_post,
+                        eod_time=eod_time,
+                        bot_index=bot_index
+                        )
 
-                    victim_is_voter = True
-                    last_request    = tr.get_last_vhistory_from(game_thread=settings.game_thread,
-                                                                bot_id=settings.mediavida_user,
-                                                                player=game_action.victim)
-                else:
-                    victim_is_voter = False
-                    last_request    = tr.get_last_voters_from(game_thread=settings.game_thread,
-                                                              bot_id=settings.mediavida_user,
-                                                              player=game_action.victim)
-                
-                if game_action.id > last_request:
-                    User.add_vhistory_to_queue(action=game_action,
-                                               vhistory=vcount._vote_history,
-                                               victim_is_voter=victim_is_voter)
-            
-            elif game_action.type == actions.Action.request_count: 
-
-                if game_action.author in staff:
-
-                    if game_action.id > last_count:
-                        if game_action.target_post != 0:
-                            parsed_post   = game_action.target_post
-                            table_to_push = vcount._vote_history.loc[vcount._vote_history["post_id"] >= day_start]
-                            table_to_push = table_to_push.loc[(table_to_push["post_id"] <= parsed_post) & ((table_to_push["unvoted_at"] == 0) | (table_to_push["unvoted_at"] > parsed_post))]
-                        else:
-                            table_to_push = vcount._vote_table
-                            parsed_post   = game_action.id
+                        for action in action_queue:
+                            if action.post_time < eod_time:
+                                cursor.last_valid_action = max(cursor.last_valid_action, action.id)
 
-                        push_vote_count(vote_table=table_to_push,
-                                        alive_players=Players.players,
-                                        last_parsed_post=parsed_post,
-                                        current_majority=vcount.current_majority
-                                        )
+                        if len(action_queue) > 0:
+                            cursor.advance(action_queue[-1].id)
 
+                    ## Posts without actions up to the last reply are done too
+                    cursor.advance(last_thread_post)
 
-            elif game_action.type == actions.Action.freeze_vote:
-                ## TODO: Move this logic to the vcount?
-                if game_action.author in staff:
-                    if game_action.victim == 'none': ## general freeze
+                    stage_end = eod_time
 
-                        for player in vcount._vote_table['voted_by'].unique():
-                            vcount.freeze_player_votes(player)
-                    else:
-                        vcount.freeze_player_votes(game_action.victim)
-            
-            elif game_action.type == actions.Action.reveal:
-                if game_action.author == vcount.mayor: ## mayor?
-                    if vcount.vote_rights.loc[game_action.author, "allowed_votes"] < 3: ## nope, not revealed
-                        vcount.update_vote_limits(player=game_action.author, new_limit=3)
-                        announce_mayor(new_mayor=vcount.get_real_names()[game_action.author])
-
-
-            elif game_action.type == actions.Action.revive and game_action.author in staff:
-                if vcount.player_exists(game_action.victim.lower()): ## make sure this guy actually played and has rights
-                    Players.revive_player(game_action.victim)
-                else:
-                    logging.warning(f"Attempting to revive invalid player {game_action.victim}")
-
-            elif game_action.type == actions.Action.shoot:
-                if Players.player_exists(game_action.victim) and game_action.victim not in staff:
-                    was_valid_shot, is_dead_victim = Players.shoot_player(game_action)
-                    if was_valid_shot:
-                        if is_dead_victim:
-                            vcount.remove_player(game_action.victim)
+                    ## Check If there is still time left to play. Otherwise, start the EoD
+                    if game_status.is_end_of_stage(current_time = current_time) and not self.majority_reached:
                         
+                        self.majority_reached = True ## This will stop the bot in the next iteration
+                        logging.info("EoD detected. Pushing last valid votecount and preparing flip routine")
 
-                        attacker_real_name = vcount.get_real_names()[game_action.author]
-                        victim_real_name = vcount.get_real_names()[game_action.victim]
+                        end_of_day_victim = VoteCount.get_current_lynch_candidate()
+                        lynch_is_revealed = settings.reveal_eod_lynch
 
-                        ## check if the bot already announced this
-                        last_shot_fired = tr.get_last_shot_by(
-                            game_thread=settings.game_thread,
-                            bot_id=settings.mediavida_user,
-                            player=attacker_real_name
+                        if end_of_day_victim is None or end_of_day_victim == "no_lynch" or not lynch_is_revealed:
+                            role_to_reveal = None
+                        else:
+                            role_to_reveal = f"{Players.get_player_role(end_of_day_victim)} - {Players.get_player_team(end_of_day_victim)}"
+
+                        User = user.User(config=settings, names=self.names)
+                        User.push_lynch(
+                            last_votecount=VoteCount._vote_table,
+                            victim=end_of_day_victim,
+                            post_id=cursor.last_valid_action,
+                            reveal=role_to_reveal,
+                            is_eod=True
                             )
 
-                        if game_action.id > last_shot_fired:
-                            ## TODO: refactor when players are actual objects 
-                            User.queue_shooting(
-                                attacker=attacker_real_name,
-                                victim=victim_real_name,
-                                is_dead=is_dead_victim,
-                                reveal=f"{Players.get_player_role(game_action.victim)} - {Players.get_player_team(game_action.victim)}"
-                                )
+                        self.majority_reached      = True
+                        VoteCount.majority_reached = True
+
+                    is_idle = self.majority_reached
+
+                    ## get votes casted since last update
+                    votes_since_update = VoteCount.count_votes_since(last_votecount_id)
+
+                    should_update =  self.update_thread_vote_count(last_count=last_votecount_id,
+                                                                   last_post=last_thread_post,
+                                                                   votes_since_update=votes_since_update
+                                                                   )     
+                    
+                    if should_update:
+                        logging.info('Pushing a new votecount')
+                        self.push_vote_count(vote_table=VoteCount._vote_table,
+                                             alive_players=Players.players,
+                                             last_parsed_post=last_thread_post,
+                                             current_majority=VoteCount.current_majority,
+                                             closest_to_majority=VoteCount.get_closest_to_majority()
+                                             )
+                    else:
+                        logging.info('Recent votecount detected. ')
+                    
                 else:
-                    logging.info(f"Invalid victim:{game_action.victim} at {game_action.id}")
-            
-     
-    ## Finally, push the queue If needed
-    User.push_queue()
+                    logging.info('Majority already reached. Skipping...')   
+
+                # Commit the game tables and the day snapshot at once, then save the scan cursor
+                snapshot.save_snapshot({"players": Players.get_day_state(),
+                                        "vote_count": VoteCount.get_day_state(),
+                                        "cursor": cursor})
+                store.flush()
+                cursor.save()
+
+            elif game_status.game_stage  == stages.Stage.Night:
+                game_status.set_stage_duration(stage_hours = settings.night_duration)
+                game_status.set_stage_start_hour(stage_start=settings.stage_start_time)
+                stage_end = game_status.get_end_of_stage()
+
+                ## The day is over: write the changed rows of the CSV mirror
+                store.flush(rewrite=True)
+                logging.info('Night phase detected. Skipping...')
+                print('We are on night phase!')
+
+            #TODO: Exit routine here
+            elif game_status.game_stage == stages.Stage.End:
                 
-def update_thread_vote_count(last_count:int, last_post:int, votes_since_update:int) -> bool:
-    """Decide if a new vote count should be posted based on:
-        
-    a) Pending GM requests.\n
-    b) How many messages were posted since the last vote count. This is used-defined.\n
+                print('Game ended!')
+                logging.info(f'Game {settings.game_thread} ended. Stopping it now')
 
+                store.flush(rewrite=True)
+                store.close()
+                return None
 
-    Args:
-        last_count (int): The id of the last vote count pushed to the game thread.
-        last_post (int): The id of the last post in the game thread.
-        votes_since_update (int): The amount of casted votes since last_count.
+        finally:
+            logging.info(f'Tick requests: {fetcher.get_report()}')
+            fetcher.end_tick()
 
-    Returns:
-        bool: Whether to push a new vote count.
-    """
-    post_update = False
-    vote_update = False
+        update_tick = self.scheduler.get_next_interval(current_time=current_time,
+                                                       stage_end=stage_end,
+                                                       is_idle=is_idle)
+        logging.info(f'Sleeping for {update_tick:.0f} seconds.')  
 
-    if last_post - last_count >= settings.posts_until_update:
-        post_update = True
-    elif votes_since_update >= settings.votes_until_update:
-        vote_update = True
+        print(f'Sleeping for {update_tick:.0f} seconds.')
 
-    return (vote_update | post_update)
+        self.bot_cycles += 1
 
-  
-def push_vote_count(vote_table: pd.DataFrame, alive_players: list, last_parsed_post: int, current_majority: int):
-    """Instance a new User object to push a vote count using the current vote table. 
-    The object is deleted afterwards.
+        return update_tick
 
-    Args:
-        vote_table (pd.DataFrame): A dataframe with the vote table to parse for the post.
-        alive_players (list): The list of alive players.
-        last_parsed_post (int):  Last post parsed by the bot.
-        current_majority (int): The n. votes to reach majority.
-    """
-    User = user.User(config=settings)
-                    
-    User.push_votecount(vote_count=vote_table,
-                        alive_players=alive_players,
-                        vote_majority=current_majority,
-                        post_id=last_parsed_post)
 
-    del User
+    #TODO: Handle actual permissions without a giant if/else
+    #TODO: This func. is prime candidate for refactoring
+    def resolve_action_queue(self, queue: list, vcount: vote_count.VoteCount, Players: pl.Players, last_count:int, day_start:int, eod_time:int, bot_index: BotPostIndex):
+        '''
+        Parameters:  \n
+        queue: A list of game actions.\n
+        vcount: The current Vote Count.\n
+        bot_index: The index of the messages already pushed by the bot.\n
+        '''
 
-def announce_mayor(new_mayor: str):
-    """Push a new mayor announcement to the bot as a priority message.
+        User    = user.User(config=self.settings, names=self.names)
+        allowed_actors = Players.players + self.staff
 
-    Args:
-        new_mayor (str): Mayor name
-    """
-    User = user.User(config=settings)
-    User.push_new_mayor(new_mayor=new_mayor)
-    del User
+        for game_action in queue:
 
+            ## Ignore actions out of EoD except those coming from the staff
+            if game_action.post_time >= eod_time and game_action.author not in self.staff:
+                continue
 
-def announce_bot_activation():
-    """ Announce bot activation to the thread
-    """
-    User = user.User(config=settings)
-    User.push_welcome_message()
-    del User
+            if game_action.author in allowed_actors:
+
+                if game_action.type == actions.Action.vote and (Players.player_exists(game_action.victim) or game_action.victim == "no_lynch"):
+
+                    vcount.vote_player(action=game_action)
+
+                    if vcount.is_lynched(victim=game_action.victim):
+
+                        self.majority_reached   = True
+                        vcount.majority_reached = True
+
+                        User.push_lynch(last_votecount=vcount._vote_table,
+                                        victim=game_action.victim,
+                                        post_id=game_action.id,
+                                        reveal=f"{Players.get_player_role(game_action.victim)} - {Players.get_player_team(game_action.victim)}"
+                        )
+                        break
+
+                elif game_action.type == actions.Action.unvote:
+                    vcount.unvote_player(action=game_action)
+
+                elif game_action.type == actions.Action.lylo:
+
+                    logging.info(f'{game_action.author} requested an vcount lock at  {game_action.id}')
+
+                    if game_action.author in self.staff:
+                        vcount.lock_unvotes()
+
+                elif game_action.type == actions.Action.replace_player and game_action.author in self.staff:
+
+                    ## The vote count registers the substitute name first
+                    vcount.replace_player(replaced=game_action.actor, replaced_by=game_action.victim)
+                    Players.replace_player(player_out = game_action.actor,player_in = game_action.victim)
+                    allowed_actors.remove(game_action.actor)
+
+                    if game_action.victim not in allowed_actors:
+                        allowed_actors.append(game_action.victim)
+
+                elif game_action.type == actions.Action.modkill or game_action.type == actions.Action.kill or game_action.type == actions.Action.winner:
+                    if game_action.author in self.staff:
+                        Players.remove_player(game_action.victim)
+                        vcount.remove_player(game_action.victim)
+
+                elif game_action.type == actions.Action.vote_history or game_action.type == actions.Action.get_voters:
+
+                    if game_action.type == actions.Action.vote_history:
+
+                        victim_is_voter = True
+                        last_request    = bot_index.get_last_vhistory_from(player=game_action.victim)
+                    else:
+                        victim_is_voter = False
+                        last_request    = bot_index.get_last_voters_from(player=game_action.victim)
+
+                    if game_action.id > last_request:
+                        User.add_vhistory_to_queue(action=game_action,
+                                                   history_index=vcount.history_index,
+                                                   victim_is_voter=victim_is_voter)
+
+                        if victim_is_voter:
+                            bot_index.mark_vhistory_from(player=game_action.victim)
+                        else:
+                            bot_index.mark_voters_from(player=game_action.victim)
+
+                elif game_action.type == actions.Action.all_vote_history:
+
+                    if game_action.author in self.staff:
+                        ## One report for every alive player, straight from the history index
+                        User.push_all_vote_histories(history_index=vcount.history_index,
+                                                     players=sorted(Players.players),
+                                                     requested_by=game_action.author,
+                                                     post_id=game_action.id)
+
+                elif game_action.type == actions.Action.request_count: 
+
+                    if game_action.author in self.staff:
+
+                        if game_action.id > last_count:
+                            ## The closest to majority view is only known for the live count
+                            if game_action.target_post != 0:
+                                parsed_post   = game_action.target_post
+                                table_to_push = vcount.get_vote_table_at(post_id=parsed_post)
+                                closest       = None
+                            else:
+                                table_to_push = vcount._vote_table
+                                parsed_post   = game_action.id
+                                closest       = vcount.get_closest_to_majority()
+
+                            self.push_vote_count(vote_table=table_to_push,
+                                            alive_players=Players.players,
+                                            last_parsed_post=parsed_post,
+                                            current_majority=vcount.current_majority,
+                                            key=f"recuento:{game_action.id}",
+                                            closest_to_majority=closest
+                                            )
+
+
+                elif game_action.type == actions.Action.freeze_vote:
+                    ## TODO: Move this logic to the vcount?
+                    if game_action.author in self.staff:
+                        if game_action.victim == 'none': ## general freeze
+
+                            for player in vcount.get_voters():
+                                vcount.freeze_player_votes(player)
+                        else:
+                            vcount.freeze_player_votes(game_action.victim)
+
+                elif game_action.type == actions.Action.reveal:
+                    if game_action.author == vcount.mayor: ## mayor?
+                        if vcount.vote_rights.loc[game_action.author, "allowed_votes"] < 3: ## nope, not revealed
+                            vcount.update_vote_limits(player=game_action.author, new_limit=3)
+                            self.announce_mayor(new_mayor=game_action.author)
+
+
+                elif game_action.type == actions.Action.revive and game_action.author in self.staff:
+                    if vcount.player_exists(game_action.victim.lower()): ## make sure this guy actually played and has rights
+                        Players.revive_player(game_action.victim)
+                    else:
+                        logging.warning(f"Attempting to revive invalid player {game_action.victim}")
+
+                elif game_action.type == actions.Action.shoot:
+                    if Players.player_exists(game_action.victim) and game_action.victim not in self.staff:
+                        was_valid_shot, is_dead_victim = Players.shoot_player(game_action)
+                        if was_valid_shot:
+                            if is_dead_victim:
+                                vcount.remove_player(game_action.victim)
+
+                            ## check if the bot already announced this
+                            last_shot_fired = bot_index.get_last_shot_by(player=game_action.author)
+
+                            if game_action.id > last_shot_fired:
+                                ## TODO: refactor when players are actual objects 
+                                User.queue_shooting(
+                                    attacker=game_action.author,
+                                    victim=game_action.victim,
+                                    is_dead=is_dead_victim,
+                                    reveal=f"{Players.get_player_role(game_action.victim)} - {Players.get_player_team(game_action.victim)}",
+                                    post_id=game_action.id
+                                    )
+                                bot_index.mark_shot_by(player=game_action.author)
+                    else:
+                        logging.info(f"Invalid victim:{game_action.victim} at {game_action.id}")
+
+
+        ## Finally, push the queue If needed
+        User.push_queue()
+
+    def update_thread_vote_count(self, last_count:int, last_post:int, votes_since_update:int) -> bool:
+        """Decide if a new vote count should be posted based on:
+
+        a) Pending GM requests.\n
+        b) How many messages were posted since the last vote count. This is used-defined.\n
+
+
+        Args:
+            last_count (int): The id of the last vote count pushed to the game thread.
+            last_post (int): The id of the last post in the game thread.
+            votes_since_update (int): The amount of casted votes since last_count.
+
+        Returns:
+            bool: Whether to push a new vote count.
+        """
+        post_update = False
+        vote_update = False
+
+        if last_post - last_count >= self.settings.posts_until_update:
+            post_update = True
+        elif votes_since_update >= self.settings.votes_until_update:
+            vote_update = True
+
+        return (vote_update | post_update)
+
+
+    def push_vote_count(self, vote_table: pd.DataFrame, alive_players: list, last_parsed_post: int, current_majority: int, key: str = None, closest_to_majority: tuple = None):
+        """Instance a new User object to push a vote count using the current vote table. 
+        The object is deleted afterwards.
+
+        Args:
+            vote_table (pd.DataFrame): A dataframe with the vote table to parse for the post.
+            alive_players (list): The list of alive players.
+            last_parsed_post (int):  Last post parsed by the bot.
+            current_majority (int): The n. votes to reach majority.
+            key (str, optional): Idempotency key of the message. Defaults to one vote count per post.
+            closest_to_majority (tuple, optional): The players closest to majority, from VoteCount.get_closest_to_majority.
+        """
+        User = user.User(config=self.settings, names=self.names)
+
+        User.push_votecount(vote_count=vote_table,
+                            alive_players=alive_players,
+                            vote_majority=current_majority,
+                            post_id=last_parsed_post,
+                            key=key,
+                            closest_to_majority=closest_to_majority)
+
+        del User
+
+    def announce_mayor(self, new_mayor: str):
+        """Push a new mayor announcement to the bot as a priority message.
+
+        Args:
+            new_mayor (str): Mayor name
+        """
+        User = user.User(config=self.settings, names=self.names)
+        User.push_new_mayor(new_mayor=new_mayor)
+        del User
+
+
+    def announce_bot_activation(self):
+        """ Announce bot activation to the thread
+        """
+        User = user.User(config=self.settings)
+        User.push_welcome_message()
+        del User
+
+    def get_last_bot_cycle(self) -> int:
+        try:
+            last_cycle  = store.get_last_value("vote_history", "bot_cycle")
+            cur_cycle   = int(last_cycle) + 1
+            return cur_cycle
+        except:
+            return 0
 
-def get_last_bot_cycle() -> int:
-    try:
-        previous_vote_history = pd.read_csv('vote_history.csv', sep=',')
-        last_cycle  = previous_vote_history['bot_cycle'].tail(1).values[0]
-        cur_cycle   = last_cycle + 1
-        return cur_cycle
-    except:
-        return 0
 
 def get_current_ntp_time() -> int:
+    if replay_clock is not None:
+        return replay_clock.now()
+
     try:
         ntp_client = ntplib.NTPClient()
         response = ntp_client.request("pool.ntp.org")
@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+
+from modules.game_actions import GameAction
+
+
+class ActionJournal:
+
+    def __init__(self, file_to_load:str="action_journal.jsonl"):
+        """Append-only log of every game action parsed from the game thread,
+        in post order. When the state of a day has to be rebuilt without a
+        snapshot, its actions are resolved again from the journal instead of
+        downloading the day from the forum.
+
+        The journal is not the source of the game tables, and they are not
+        folded from it: the game store is, and its commits together with the
+        day snapshot are the only checkpoints. Resolving an action already
+        applied to the tables changes nothing: votes and shots are deduplicated
+        by post and bot cycle, and unvotes by post.
+
+        Args:
+            file_to_load (str, optional): The journal file, one JSON record per line. Defaults to "action_journal.jsonl".
+        """
+        self._journal_file = file_to_load
+        self._records      = list()
+
+        if os.path.isfile(self._journal_file):
+            with open(self._journal_file, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        self._records.append(json.loads(line))
+                    except ValueError:
+                        ## A crash while appending leaves at most one broken line at the end
+                        logging.warning("Skipping a broken line of the action journal")
+
+        self.last_post = self._records[-1]["id"] if len(self._records) > 0 else 0
+
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+    def append(self, queue:list):
+        """Journal the actions of a page. Posts already journaled are skipped,
+        so the same page can be appended more than once.
+
+        Args:
+            queue (list): Game actions, in post order.
+        """
+        new_records = [action.to_record() for action in queue if action.id > self.last_post]
+
+        if len(new_records) == 0:
+            return
+
+        with open(self._journal_file, "a", encoding="utf-8") as journal:
+            journal.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in new_records))
+
+        self._records.extend(new_records)
+        self.last_post = new_records[-1]["id"]
+
+
+    def get_actions(self, since_post:int) -> list:
+        """Get the journaled actions from a given post onwards.
+
+        Args:
+            since_post (int): The first post to include, i.e. the day start.
+
+        Returns:
+            list: The game actions, in post order.
+        """
+        return [GameAction.from_record(record) for record in self._records if record["id"] >= since_post]
@@ -0,0 +1,174 @@
+import logging
+import re
+
+import modules.thread_reader as tr
+from modules.extractors import get_extractor
+
+
+class BotPostIndex:
+
+    def __init__(self, game_thread:str, bot_id:str):
+        """In-memory index of the messages pushed by the bot to the game thread.
+        The bot posts are walked once per iteration and every h2 header is
+        classified, so that all the "last X pushed" lookups are dict reads.
+
+        Args:
+            game_thread (str): The game thread. Must be from mediavida.com.
+            bot_id (str): Bot name.
+        """
+        self.game_thread = game_thread
+        self.bot_id      = bot_id
+
+        self.last_count_id        = 1
+        self.last_count_was_lynch = False
+
+        ## Last post id pushed for each kind of report, by lowercased player
+        self._last_pushed = {"vhistory": dict(), "voters": dict(), "shot": dict()}
+
+        ## Requests answered during this iteration, not indexed yet
+        self._pending = set()
+
+        self._last_indexed_post = 0
+
+        self._vote_count_regex    = re.compile('^Recuento de votos$')
+        self._final_count_regex   = re.compile('^Recuento de votos final$')
+        self._vote_history_regex  = re.compile('^Historial de votos de (.+)$')
+        self._voter_history_regex = re.compile('^Historial de votantes de (.+)$')
+        self._shot_regex          = re.compile('^¡(.+) tiene un arma!$')
+
+
+    def update(self):
+        """Walk the bot posts from the newest to the oldest one, stopping at
+        the last post indexed in a previous call.
+        """
+        bot_posts = tr.get_page_html(f'{self.game_thread}?u={self.bot_id}')
+        bot_pages = tr.get_page_count_from_page(bot_posts)
+
+        self._newest_post = self._last_indexed_post
+        self._done        = False
+
+        # We'll start looping from the last page to the previous one
+        for pagenum in range(bot_pages, 0, -1):
+
+            request      = tr.get_page_html(f'{self.game_thread}?u={self.bot_id}&pagina={pagenum}')
+            posts        = get_extractor().extract_posts(request)
+
+            for post in reversed(posts): # from more recent to older posts
+
+                post_id = post.id
+
+                if post_id <= self._last_indexed_post:
+                    self._done = True
+                    break
+
+                self._newest_post = max(self._newest_post, post_id)
+                self._index_post(post_id=post_id, headers=post.headers)
+
+            if self._done:
+                break
+
+        logging.info(f'Indexed bot posts from {self._last_indexed_post} to {self._newest_post}')
+
+        self._last_indexed_post = self._newest_post
+        self._pending.clear()
+
+
+    def get_last_votecount(self) -> tuple:
+        """Get the post id of the last automated vote count pushed.
+
+        Returns:
+            tuple: A tuple of two values: an int being the post ID of the last votecount
+        and a boolean indicating if the last votecount was an EoD votecount.
+        """
+        return (self.last_count_id, self.last_count_was_lynch)
+
+
+    def get_last_vhistory_from(self, player:str) -> int:
+        """Get the post id of the last pushed vote history for a given player.
+
+        Args:
+            player (str): The player whose vote history was pushed.
+
+        Returns:
+            int: The post id of the last vote history pushed for the given player.
+        """
+        return self._lookup("vhistory", player)
+
+
+    def get_last_voters_from(self, player:str) -> int:
+        """Get the post id of the last pushed voter history for a given player.
+
+        Args:
+            player (str): The player whose voter history was pushed.
+
+        Returns:
+            int: The post id of the last voter history pushed for the given player.
+        """
+        return self._lookup("voters", player)
+
+
+    def get_last_shot_by(self, player:str) -> int:
+        """Get the post id of the last pushed shot for a given player.
+
+        Args:
+            player (str): The shooting player.
+
+        Returns:
+            int: The post id of the last shot pushed for the given player.
+        """
+        return self._lookup("shot", player)
+
+
+    def mark_vhistory_from(self, player:str):
+        """Flag a vote history as answered until the bot post is indexed."""
+        self._pending.add(("vhistory", player.lower()))
+
+
+    def mark_voters_from(self, player:str):
+        """Flag a voter history as answered until the bot post is indexed."""
+        self._pending.add(("voters", player.lower()))
+
+
+    def mark_shot_by(self, player:str):
+        """Flag a shot as announced until the bot post is indexed."""
+        self._pending.add(("shot", player.lower()))
+
+
+    def _lookup(self, kind:str, player:str):
+        ## Anything pending was answered after every post parsed so far
+        if (kind, player.lower()) in self._pending:
+            return float("inf")
+
+        return self._last_pushed[kind].get(player.lower(), 1)
+
+
+    def _index_post(self, post_id:int, headers:list):
+        """Classify the h2 headers of a single bot post.
+
+        Args:
+            post_id (int): The id of the bot post.
+            headers (list): The text of every h2 header in the post.
+        """
+        self._is_count = False
+
+        for header in headers:
+
+            if not self._is_count:
+                if self._vote_count_regex.match(header) or self._final_count_regex.match(header):
+                    self._is_count = True
+
+                    if post_id > self.last_count_id:
+                        self.last_count_id        = post_id
+                        self.last_count_was_lynch = bool(self._final_count_regex.match(header))
+                    continue
+
+            for kind, regex in [("vhistory", self._vote_history_regex),
+                                ("voters", self._voter_history_regex),
+                                ("shot", self._shot_regex)]:
+
+                self._match = regex.match(header)
+
+                if self._match:
+                    self._player = self._match.group(1).lower()
+                    self._last_pushed[kind][self._player] = max(self._last_pushed[kind].get(self._player, 1), post_id)
+                    break
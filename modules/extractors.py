@@ -0,0 +1,175 @@
+import collections
+import logging
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+
+## Everything the bot reads from a single mediavida post
+Post = collections.namedtuple("Post", ["id", "author", "time", "is_thread_post",
+                                       "headers", "commands", "player_list"])
+
+# MV has unqiue div elements for odd and even posts,
+# and another one for the very first post of the page.
+# Edit div elements are ignored because players should not edit while playing.
+THREAD_POST_CLASSES = {"cf post", "cf post z", "cf post first"}
+
+
+class SoupExtractor:
+
+    name = "soup"
+
+    def __init__(self):
+        """BeautifulSoup extraction backend. Only the post divs and the bottom
+        page panel are parsed, thanks to SoupStrainer.
+        """
+        self._post_strainer  = SoupStrainer("div", attrs={"data-num": True, "data-autor": True})
+        self._panel_strainer = SoupStrainer("div", id="bottompanel")
+
+
+    def extract_posts(self, request_text:str) -> list:
+        """Extract every post from the HTML code of a mediavida page.
+
+        Args:
+            request_text (str): HTML text of the page.
+
+        Returns:
+            list: A list of Post tuples in page order.
+        """
+        page  = BeautifulSoup(request_text, "html.parser", parse_only=self._post_strainer)
+        posts = list()
+
+        for post in page.find_all("div", attrs={"data-num": True, "data-autor": True}):
+
+            time_span     = post.find("span", class_="rd") or post.find("span", attrs={"data-time": True})
+            post_content  = post.find("div", class_="post-contents")
+            first_list    = post.find("ol")
+
+            posts.append(Post(id=int(post["data-num"]),
+                              author=post["data-autor"],
+                              time=int(time_span["data-time"]) if time_span is not None else 0,
+                              is_thread_post=" ".join(post.get("class", [])) in THREAD_POST_CLASSES,
+                              headers=[header.text for header in post.find_all("h2")],
+                              commands=[command.text for command in post_content.find_all("h4")] if post_content is not None else [],
+                              player_list=[player.get_text() for player in first_list.find_all("a") if player.get_text()] if first_list is not None else []))
+
+        return posts
+
+
+    def extract_page_count(self, request_text:str) -> int:
+        """Extract the page count of a thread from the bottom page panel.
+
+        Args:
+            request_text (str): HTML text of the page.
+
+        Returns:
+            int: The total page length of the thread. Defaults to 1.
+        """
+        try:
+            panel_layout = BeautifulSoup(request_text, "html.parser", parse_only=self._panel_strainer)
+            panel_layout = panel_layout.find("div", id="bottompanel")
+
+            return int(panel_layout.find_all("a")[-2].get_text())
+        except:
+            return 1
+
+
+class LxmlExtractor:
+
+    name = "lxml"
+
+    def __init__(self):
+        """lxml extraction backend. Requires the optional lxml package."""
+        if lxml is None:
+            raise ImportError("The lxml backend requires the lxml package")
+
+
+    def extract_posts(self, request_text:str) -> list:
+        """Extract every post from the HTML code of a mediavida page.
+
+        Args:
+            request_text (str): HTML text of the page.
+
+        Returns:
+            list: A list of Post tuples in page order.
+        """
+        posts = list()
+
+        ## lxml rejects empty documents
+        if not request_text.strip():
+            return posts
+
+        page = lxml.html.fromstring(request_text)
+
+        for post in page.xpath("//div[@data-num and @data-autor]"):
+
+            time_span    = post.xpath(".//span[contains(concat(' ', normalize-space(@class), ' '), ' rd ')]") or post.xpath(".//span[@data-time]")
+            post_content = post.xpath(".//div[contains(concat(' ', normalize-space(@class), ' '), ' post-contents ')]")
+            first_list   = post.xpath(".//ol")
+
+            posts.append(Post(id=int(post.get("data-num")),
+                              author=post.get("data-autor"),
+                              time=int(time_span[0].get("data-time")) if time_span else 0,
+                              is_thread_post=" ".join(post.get("class", "").split()) in THREAD_POST_CLASSES,
+                              headers=[header.text_content() for header in post.iter("h2")],
+                              commands=[command.text_content() for command in post_content[0].iter("h4")] if post_content else [],
+                              player_list=[player.text_content() for player in first_list[0].iter("a") if player.text_content()] if first_list else []))
+
+        return posts
+
+
+    def extract_page_count(self, request_text:str) -> int:
+        """Extract the page count of a thread from the bottom page panel.
+
+        Args:
+            request_text (str): HTML text of the page.
+
+        Returns:
+            int: The total page length of the thread. Defaults to 1.
+        """
+        try:
+            links = lxml.html.fromstring(request_text).xpath("//div[@id='bottompanel']//a")
+            return int(links[-2].text_content())
+        except:
+            return 1
+
+
+BACKENDS = {"lxml": LxmlExtractor, "soup": SoupExtractor}
+
+_active_extractor = None
+
+
+def use_backend(name:str="auto"):
+    """Select the extraction backend used by the thread readers.
+
+    Args:
+        name (str, optional): One of "auto", "lxml" or "soup". "auto" picks lxml when
+        it is installed. Defaults to "auto".
+    """
+    global _active_extractor
+
+    if name == "auto":
+        name = "lxml" if lxml is not None else "soup"
+
+    if name not in BACKENDS:
+        raise ValueError(f"Invalid HTML backend. Expected one of {list(BACKENDS)}, got {name}")
+
+    try:
+        _active_extractor = BACKENDS[name]()
+    except ImportError:
+        logging.warning(f"HTML backend {name} is not available. Falling back to soup")
+        _active_extractor = SoupExtractor()
+
+    logging.info(f"Using the {_active_extractor.name} HTML backend")
+
+
+def get_extractor():
+    """Get the active extraction backend, selecting one if needed."""
+    if _active_extractor is None:
+        use_backend()
+
+    return _active_extractor
@@ -0,0 +1,244 @@
+import contextvars
+import logging
+import threading
+import time
+
+import requests
+import urllib3
+
+import modules.replay as replay
+
+
+class FetchTick:
+
+    def __init__(self):
+        """Pages and counters of a single bot iteration."""
+        self.started   = time.time()
+        self.memo      = dict()
+        self.in_flight = dict()
+        self.stats     = {"requests": 0, "failed": 0, "saved": 0, "bytes": 0, "seconds": 0.0}
+        self.token     = None
+
+
+class Fetcher:
+
+    def __init__(self, timeout:float=10, retries:int=3, backoff_factor:float=1, pool_size:int=10):
+        """Shared HTTP fetch layer for every mediavida.com request. A single
+        requests.Session keeps the connections alive between requests, so that
+        the bot pays the TCP+TLS handshake once instead of once per page.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the server. Defaults to 10.
+            retries (int, optional): How many times a failed request is retried. Defaults to 3.
+            backoff_factor (float, optional): Exponential backoff factor between retries. Defaults to 1.
+            pool_size (int, optional): Max. number of pooled connections per host. Defaults to 10.
+        """
+        self.timeout        = timeout
+        self.retries        = retries
+        self.backoff_factor = backoff_factor
+        self.pool_size      = pool_size
+
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        ## Tick-scoped memo: each url is downloaded at most once per tick.
+        ## Each game has its own tick, followed by the threads it starts.
+        self._current_tick = contextvars.ContextVar("fetch_tick", default=None)
+
+        self.session = self._build_session()
+
+
+    def configure(self, timeout:float=None, retries:int=None, backoff_factor:float=None, pool_size:int=None):
+        """Change the fetcher settings. The session is rebuilt if the retry
+        policy or the pool size changes.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the server.
+            retries (int, optional): How many times a failed request is retried.
+            backoff_factor (float, optional): Exponential backoff factor between retries.
+            pool_size (int, optional): Max. number of pooled connections per host.
+        """
+        if timeout is not None:
+            self.timeout = timeout
+
+        rebuild = False
+
+        if retries is not None and retries != self.retries:
+            self.retries = retries
+            rebuild      = True
+
+        if backoff_factor is not None and backoff_factor != self.backoff_factor:
+            self.backoff_factor = backoff_factor
+            rebuild             = True
+
+        if pool_size is not None and pool_size != self.pool_size:
+            self.pool_size = pool_size
+            rebuild        = True
+
+        if rebuild:
+            self.session.close()
+            self.session = self._build_session()
+
+
+    def begin_tick(self):
+        """Start a new bot iteration. Until end_tick is called, each url is
+        downloaded at most once and concurrent requests for the same url are
+        coalesced into a single download.
+
+        The iteration belongs to the calling context: the memo and the
+        counters of a game are not shared with the other games. Threads
+        started during the iteration take part in it if they run in a copy
+        of the calling context (see contextvars.copy_context).
+        """
+        tick       = FetchTick()
+        tick.token = self._current_tick.set(tick)
+
+
+    def end_tick(self):
+        """Finish the current bot iteration and drop the memoized pages."""
+        tick = self._current_tick.get()
+
+        if tick is not None:
+            self._current_tick.reset(tick.token)
+
+
+    def get(self, url:str) -> str:
+        """Perform a GET request through the pooled session. During a tick the
+        page is served from the memo if it was already downloaded.
+
+        Args:
+            url (str): The url to fetch.
+
+        Returns:
+            str: The response body as text.
+        """
+        tick = self._current_tick.get()
+
+        if tick is None:
+            return self._download(url, tick)
+
+        while True:
+            with self._lock:
+                if url in tick.memo:
+                    for stats in self._get_stats(tick):
+                        stats["saved"] += 1
+                    return tick.memo[url]
+
+                waiting_for = tick.in_flight.get(url)
+
+                if waiting_for is None:
+                    in_flight = threading.Event()
+                    tick.in_flight[url] = in_flight
+                    break
+
+            # Another thread is already downloading this url
+            waiting_for.wait()
+
+        try:
+            text = self._download(url, tick)
+
+            with self._lock:
+                tick.memo[url] = text
+
+            return text
+
+        finally:
+            with self._lock:
+                tick.in_flight.pop(url, None)
+            in_flight.set()
+
+
+    def _download(self, url:str, tick:FetchTick) -> str:
+        """Download a page, updating the request, byte and latency counters.
+
+        Args:
+            url (str): The url to fetch.
+            tick (FetchTick): The current iteration, or None.
+
+        Returns:
+            str: The response body as text.
+        """
+        start = time.perf_counter()
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            with self._lock:
+                for stats in self._get_stats(tick):
+                    stats["failed"] += 1
+            logging.exception(f"Failed request: {url}")
+            raise
+
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            for stats in self._get_stats(tick):
+                stats["requests"] += 1
+                stats["bytes"]    += len(response.content)
+                stats["seconds"]  += elapsed
+
+        logging.debug(f"GET {url} {response.status_code} {len(response.content)} bytes in {elapsed:.3f}s")
+
+        if replay.recorder is not None:
+            replay.recorder.record_page(url, response.text, captured_at=tick.started if tick is not None else None)
+
+        return response.text
+
+
+    def reset_stats(self):
+        """Reset the process wide request, byte and latency counters."""
+        with self._lock:
+            self.stats = {"requests": 0, "failed": 0, "saved": 0, "bytes": 0, "seconds": 0.0}
+
+
+    def get_report(self) -> str:
+        """Get a one-line summary of the counters of the current iteration,
+        or of the process wide counters outside of any iteration.
+
+        Returns:
+            str: Requests, failures, requests saved by the memo, downloaded bytes and mean latency.
+        """
+        tick = self._current_tick.get()
+
+        ## Locals only: games report their iterations from several threads
+        with self._lock:
+            stats = dict(tick.stats if tick is not None else self.stats)
+
+        mean_latency = stats["seconds"] / stats["requests"] if stats["requests"] > 0 else 0
+
+        return (f'{stats["requests"]} requests ({stats["failed"]} failed, {stats["saved"]} saved), '
+                f'{stats["bytes"]} bytes, mean latency {mean_latency:.3f}s')
+
+
+    def _get_stats(self, tick:FetchTick) -> list:
+        ## Counters to update: the process wide ones and those of the iteration
+        return [self.stats] if tick is None else [self.stats, tick.stats]
+
+
+    def _build_session(self) -> requests.Session:
+        """Build a requests session with keep-alive pooling and a retry policy.
+
+        Returns:
+            requests.Session: The session to use for every request.
+        """
+        retry_policy = urllib3.util.retry.Retry(
+            total = self.retries,
+            status_forcelist = [429, 500, 502, 503, 504],
+            allowed_methods = ["HEAD", "GET", "OPTIONS"],
+            backoff_factor = self.backoff_factor
+            )
+
+        adapter = requests.adapters.HTTPAdapter(max_retries = retry_policy,
+                                                pool_connections = self.pool_size,
+                                                pool_maxsize = self.pool_size)
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
+
+
+## Shared instance used by all the thread readers
+fetcher = Fetcher()
@@ -20,7 +20,7 @@ class GameAction:
             actions.Action.unvote: self._parse_unvote,
             actions.Action.replace_player: self._replace_player,
             actions.Action.request_count: self._parse_vote_count_request,
-            actions.Action.vote_history: self._set_victim_from_arg,
+            actions.Action.vote_history: self._parse_vote_history_request,
             actions.Action.get_voters: self._set_victim_from_arg,
             actions.Action.kill: self._set_victim_from_arg,
             actions.Action.modkill: self._set_victim_from_arg,
@@ -46,6 +46,37 @@ class GameAction:
             )
             self._response(argument=self._contents)
 
+    def __getstate__(self):
+        ## Bound parsers are only needed while parsing. Leave them out of
+        ## pickled copies so cached actions stay small.
+        state = self.__dict__.copy()
+        state.pop("_action_responses", None)
+        state.pop("_response", None)
+        return state
+
+    def to_record(self) -> dict:
+        """Get the resolved fields of the action, as stored in the action journal."""
+        return {"id": self.id, "post_time": self.post_time,
+                "author": self.author, "actor": self.actor, "alias": self.alias,
+                "type": self.type.value, "victim": self.victim, "target_post": self.target_post}
+
+    @classmethod
+    def from_record(cls, record: dict):
+        """Rebuild an action from an action journal record, without parsing it again."""
+        action = cls.__new__(cls)
+
+        action.id, action.post_time = record["id"], record["post_time"]
+        action.author, action.actor, action.alias = record["author"], record["actor"], record["alias"]
+        ## Types renamed by a newer bot version are ignored
+        try:
+            action.type = actions.Action(record["type"])
+        except ValueError:
+            action.type = actions.Action.unknown
+
+        action.victim, action.target_post = record["victim"], record["target_post"]
+
+        return action
+
     def _set_victim(self, victim:str):
         
         self._new_victim = re.sub("[()]","", victim)
@@ -109,6 +140,14 @@ class GameAction:
         self._set_victim(argument[-1])
 
         
+    def _parse_vote_history_request(self, argument:list):
+
+        ## Exactly "historial de todos" asks for the history of every alive player. The victim stays "none".
+        if argument[1:] == ["de", "todos"]:
+            self.type = actions.Action.all_vote_history
+        else:
+            self._set_victim_from_arg(argument)
+
     def _request_vote_history(self, argument:list):
         self._set_victim(argument[1])
 
@@ -0,0 +1,450 @@
+import contextlib
+import contextvars
+import logging
+import os.path
+import sqlite3
+import threading
+
+import pandas as pd
+
+## Game tables: table name -> (CSV file used to seed it, indexed column, set up by the GM)
+TABLES = {
+    "vote_config":        ("vote_config.csv", "player", True),
+    "vote_history":       ("vote_history.csv", "post_id", False),
+    "attack_and_defense": ("attack_and_defense.csv", "player", True),
+    "shots_history":      ("shots_history.csv", "shooter", False),
+    "role_list":          ("role_list.csv", "player", True),
+}
+
+
+def write_csv_atomic(table:pd.DataFrame, csv_file:str):
+    """Write a table to a CSV file through a temporary file and a rename, so
+    readers and crashes never see a half-written file.
+
+    Args:
+        table (pd.DataFrame): The table to write.
+        csv_file (str): The destination file.
+    """
+    temp_file = f"{csv_file}.tmp"
+
+    table.to_csv(temp_file, sep=",", index=False, header=True)
+    os.replace(temp_file, csv_file)
+
+
+class GameStore:
+
+    def __init__(self, db_file:str="game_state.db"):
+        """Single SQLite store for every game table. Changes are written row
+        by row and only become durable on flush(), once per bot iteration and
+        together with the day snapshot, so a crash never leaves the tables
+        half updated or ahead of the snapshot.
+
+        The store is the source of truth. The GM still sets up the game with
+        the usual CSV files: each table is imported from its CSV file the first
+        time it is loaded, and the files are kept as a readable mirror of the
+        store, updated on flush() for the tables that changed. The CSV files
+        live next to the database.
+
+        The rows the bot adds to its own tables (vote_history and shots_history)
+        are appended to their file on every flush(). Rows changed after being
+        mirrored, i.e. an unvote, are only written when the whole file is
+        rewritten with flush(rewrite=True), once the day is over.
+
+        The GM can keep editing the setup tables (vote_config, attack_and_defense
+        and role_list) through their CSV files: reload_edited_tables() imports
+        them again once their file changes. The files of the tables written by
+        the bot (vote_history and shots_history) are only a mirror, and edits
+        to them are overwritten.
+
+        Args:
+            db_file (str, optional): The SQLite database file. Defaults to "game_state.db".
+        """
+        self.db_file = db_file
+
+        self._connection = None
+        self._lock       = threading.RLock()
+
+        # Tables changed since the last flush
+        self._dirty = set()
+
+        # Tables written by the bot with rows changed after being mirrored
+        self._stale = set()
+
+
+    def open(self, db_file:str):
+        """Switch to another database file, committing any pending change.
+
+        Args:
+            db_file (str): The SQLite database file.
+        """
+        self.close()
+        self.db_file = db_file
+
+
+    def close(self):
+        """Commit pending changes and close the database."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
+
+
+    def load_table(self, name:str) -> pd.DataFrame:
+        """Load a whole game table, importing it from its CSV file if needed.
+
+        Args:
+            name (str): The table name, i.e. "vote_config".
+
+        Raises:
+            FileNotFoundError: If the table is neither in the store nor in a CSV file.
+
+        Returns:
+            pd.DataFrame: The table, indexed by row id.
+        """
+        with self._lock:
+            self._import_if_missing(name)
+            table = pd.read_sql_query(f'SELECT rowid, * FROM "{name}" ORDER BY rowid', self._connect(), index_col="rowid")
+
+        return table
+
+
+    def create_table(self, name:str, table:pd.DataFrame):
+        """Create a game table from a DataFrame. Columns are left untyped, so
+        SQLite keeps the type of every stored value.
+
+        Args:
+            name (str): The table name.
+            table (pd.DataFrame): The initial rows. Its columns define the table.
+        """
+        columns = ", ".join(f'"{column}"' for column in table.columns)
+
+        with self._lock:
+            connection = self._connect()
+            connection.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({columns})')
+
+            index_column = TABLES.get(name, (None, None, False))[1]
+
+            if index_column in table.columns:
+                connection.execute(f'CREATE INDEX IF NOT EXISTS "{name}_{index_column}" ON "{name}" ("{index_column}")')
+
+            for row in table.to_dict(orient="records"):
+                self.insert_row(name, row)
+
+
+    def insert_row(self, name:str, row:dict) -> int:
+        """Append a row to a game table.
+
+        Args:
+            name (str): The table name.
+            row (dict): Column -> value.
+
+        Returns:
+            int: The row id of the new row.
+        """
+        columns = ", ".join(f'"{column}"' for column in row)
+        values  = ", ".join("?" for _ in row)
+
+        with self._lock:
+            cursor = self._connect().execute(f'INSERT INTO "{name}" ({columns}) VALUES ({values})',
+                                             [self._to_sql(value) for value in row.values()])
+            self._dirty.add(name)
+            return cursor.lastrowid
+
+
+    def update_rows(self, name:str, values:dict, where:dict):
+        """Update the rows of a game table matching every where condition.
+
+        Args:
+            name (str): The table name.
+            values (dict): Column -> new value.
+            where (dict): Column -> value the rows to update must have. Use "rowid" to target a single row.
+        """
+        assignments = ", ".join(f'"{column}" = ?' for column in values)
+        conditions  = " AND ".join(f'"{column}" = ?' if column != "rowid" else "rowid = ?" for column in where)
+
+        with self._lock:
+            self._connect().execute(f'UPDATE "{name}" SET {assignments} WHERE {conditions}',
+                                    [self._to_sql(value) for value in list(values.values()) + list(where.values())])
+            self._dirty.add(name)
+
+            if not TABLES[name][2]:
+                self._stale.add(name)
+
+
+    def get_last_value(self, name:str, column:str):
+        """Get a column of the last row of a game table.
+
+        Args:
+            name (str): The table name.
+            column (str): The column to read.
+
+        Raises:
+            FileNotFoundError: If the table is neither in the store nor in a CSV file.
+
+        Returns:
+            The value, or None if the table is empty.
+        """
+        with self._lock:
+            self._import_if_missing(name)
+            row = self._connect().execute(f'SELECT "{column}" FROM "{name}" ORDER BY rowid DESC LIMIT 1').fetchone()
+
+        return row[0] if row is not None else None
+
+
+    def has_table(self, name:str) -> bool:
+        """Check if a game table is in the store, without importing it."""
+        with self._lock:
+            return self._has_table(name)
+
+
+    def reload_edited_tables(self) -> list:
+        """Import again the GM setup tables whose CSV file was edited since it
+        was last imported or mirrored, and those added since the last call.
+        The CSV file replaces the whole table.
+
+        Returns:
+            list: The names of the tables imported again.
+        """
+        reloaded = list()
+
+        with self._lock:
+            for name, (_, _, edited_by_gm) in TABLES.items():
+                csv_file = self._get_csv_file(name)
+
+                if not edited_by_gm or not os.path.isfile(csv_file):
+                    continue
+
+                ## The GM added a missing setup table
+                if not self._has_table(name):
+                    logging.info(f"Importing {csv_file} into the game store")
+                    self._import_csv(name, csv_file)
+                    reloaded.append(name)
+                    continue
+
+                known_mtime = self._get_csv_mtime(name)
+
+                ## Tables imported by an older bot version: trust the current file
+                if known_mtime is None:
+                    self._set_csv_mtime(name, os.path.getmtime(csv_file))
+
+                elif os.path.getmtime(csv_file) != known_mtime:
+                    logging.info(f"{csv_file} was edited. Importing it again into the game store")
+
+                    self._import_csv(name, csv_file)
+                    reloaded.append(name)
+
+        return reloaded
+
+
+    def save_blob(self, name:str, data:bytes):
+        """Keep a binary value in the store, i.e. the day snapshot. Like every
+        other change, it becomes durable on the next commit.
+
+        Args:
+            name (str): The value name.
+            data (bytes): The value.
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute('CREATE TABLE IF NOT EXISTS "_blobs" ("name" TEXT PRIMARY KEY, "data" BLOB)')
+            connection.execute('INSERT OR REPLACE INTO "_blobs" ("name", "data") VALUES (?, ?)', (name, data))
+
+
+    def load_blob(self, name:str) -> bytes:
+        """Get a binary value saved with save_blob.
+
+        Args:
+            name (str): The value name.
+
+        Returns:
+            bytes: The value, or None if it was never saved.
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute('CREATE TABLE IF NOT EXISTS "_blobs" ("name" TEXT PRIMARY KEY, "data" BLOB)')
+            row = connection.execute('SELECT "data" FROM "_blobs" WHERE "name" = ?', (name,)).fetchone()
+
+        return row[0] if row is not None else None
+
+
+    def rollback(self):
+        """Drop every change since the last commit."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.rollback()
+                self._dirty.clear()
+                self._stale.clear()
+
+
+    def commit(self):
+        """Make every change since the last commit durable."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.commit()
+
+
+    def flush(self, rewrite:bool=False):
+        """Commit every pending change and update the CSV mirror of the tables
+        changed since the last flush, each of them exactly once.
+
+        Setup tables are rewritten. The tables written by the bot only get their
+        new rows appended, unless their file is missing or was changed outside
+        the store.
+
+        Args:
+            rewrite (bool, optional): Also rewrite the bot tables with rows changed
+            after being mirrored. Defaults to False, meant for the end of the day.
+        """
+        with self._lock:
+            stale_tables = self._get_stale_tables() | self._stale
+            to_mirror    = self._dirty | (stale_tables if rewrite else set())
+
+            for name in sorted(to_mirror):
+                csv_file    = self._get_csv_file(name)
+                known_mtime = self._get_csv_mtime(name)
+                is_current  = known_mtime is not None and os.path.isfile(csv_file) and os.path.getmtime(csv_file) == known_mtime
+
+                ## Do not overwrite a setup table the GM is editing. It is imported on the next reload.
+                if TABLES[name][2] and known_mtime is not None and os.path.isfile(csv_file) and not is_current:
+                    logging.warning(f"{csv_file} was edited during the iteration. Not overwriting it.")
+                    continue
+
+                last_row = self._get_mirrored_row(name)
+                is_stale = name in stale_tables
+
+                if TABLES[name][2] or not is_current or last_row is None or (rewrite and is_stale):
+                    write_csv_atomic(self.load_table(name), csv_file)
+                    is_stale = False
+                else:
+                    new_rows = pd.read_sql_query(f'SELECT * FROM "{name}" WHERE rowid > ? ORDER BY rowid', self._connect(), params=(last_row,))
+                    new_rows.to_csv(csv_file, mode="a", sep=",", index=False, header=False)
+
+                self._set_mirrored_row(name, self._connect().execute(f'SELECT MAX(rowid) FROM "{name}"').fetchone()[0] or 0, is_stale)
+                self._set_csv_mtime(name, os.path.getmtime(csv_file))
+
+            self._dirty.clear()
+            self._stale.clear()
+            self.commit()
+
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+
+        return self._connection
+
+
+    def _import_if_missing(self, name:str):
+        if self._has_table(name):
+            return
+
+        csv_file = self._get_csv_file(name)
+
+        if not os.path.isfile(csv_file):
+            raise FileNotFoundError(f"No {name} table in the store and no {csv_file} to import")
+
+        logging.info(f"Importing {csv_file} into the game store")
+        self._import_csv(name, csv_file)
+
+
+    def _import_csv(self, name:str, csv_file:str):
+        ## sqlite3 only opens a transaction on a data change. Writing the file time
+        ## first keeps the import in the pending transaction, so it is rolled back
+        ## or committed with the rest of the iteration.
+        self._set_csv_mtime(name, os.path.getmtime(csv_file))
+
+        self._connect().execute(f'DROP TABLE IF EXISTS "{name}"')
+        self.create_table(name, pd.read_csv(csv_file, sep=","))
+
+
+    def _get_csv_mtime(self, name:str) -> float:
+        connection = self._connect()
+        connection.execute('CREATE TABLE IF NOT EXISTS "_csv_files" ("name" TEXT PRIMARY KEY, "mtime" REAL)')
+
+        row = connection.execute('SELECT "mtime" FROM "_csv_files" WHERE "name" = ?', (name,)).fetchone()
+        return row[0] if row is not None else None
+
+
+    def _set_csv_mtime(self, name:str, mtime:float):
+        connection = self._connect()
+        connection.execute('CREATE TABLE IF NOT EXISTS "_csv_files" ("name" TEXT PRIMARY KEY, "mtime" REAL)')
+        connection.execute('INSERT OR REPLACE INTO "_csv_files" ("name", "mtime") VALUES (?, ?)', (name, mtime))
+
+
+    def _get_mirrored_row(self, name:str) -> int:
+        connection = self._connect()
+        connection.execute('CREATE TABLE IF NOT EXISTS "_csv_rows" ("name" TEXT PRIMARY KEY, "last_row" INTEGER, "stale" INTEGER)')
+
+        row = connection.execute('SELECT "last_row" FROM "_csv_rows" WHERE "name" = ?', (name,)).fetchone()
+        return row[0] if row is not None else None
+
+
+    def _set_mirrored_row(self, name:str, last_row:int, is_stale:bool):
+        connection = self._connect()
+        connection.execute('CREATE TABLE IF NOT EXISTS "_csv_rows" ("name" TEXT PRIMARY KEY, "last_row" INTEGER, "stale" INTEGER)')
+        connection.execute('INSERT OR REPLACE INTO "_csv_rows" ("name", "last_row", "stale") VALUES (?, ?, ?)', (name, last_row, int(is_stale)))
+
+
+    def _get_stale_tables(self) -> set:
+        connection = self._connect()
+        connection.execute('CREATE TABLE IF NOT EXISTS "_csv_rows" ("name" TEXT PRIMARY KEY, "last_row" INTEGER, "stale" INTEGER)')
+
+        return {row[0] for row in connection.execute('SELECT "name" FROM "_csv_rows" WHERE "stale" = 1')}
+
+
+    def _get_csv_file(self, name:str) -> str:
+        return os.path.join(os.path.dirname(self.db_file), TABLES[name][0])
+
+
+    def _has_table(self, name:str) -> bool:
+        row = self._connect().execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        return row is not None
+
+
+    def _to_sql(self, value):
+        ## numpy scalars cannot be bound by sqlite3
+        if hasattr(value, "item"):
+            value = value.item()
+
+        if isinstance(value, float) and value != value:
+            return None
+
+        return value
+
+
+class StoreSelector:
+
+    def __init__(self, default_store:GameStore):
+        """Route the game table calls to the store of the game being resolved.
+        Every game of the process has its own GameStore, but the game classes
+        keep using the shared store name.
+
+        Args:
+            default_store (GameStore): The store used outside of any game.
+        """
+        self._current = contextvars.ContextVar("game_store", default=default_store)
+
+
+    @contextlib.contextmanager
+    def using(self, game_store:GameStore):
+        """Route every call made in this context to a game store.
+
+        Args:
+            game_store (GameStore): The store of the game.
+        """
+        token = self._current.set(game_store)
+
+        try:
+            yield game_store
+        finally:
+            self._current.reset(token)
+
+
+    def __getattr__(self, name:str):
+        return getattr(self._current.get(), name)
+
+
+## Shared game store, routed to the store of the current game
+store = StoreSelector(GameStore())
@@ -0,0 +1,72 @@
+import collections
+
+from modules.thread_reader import get_page_number_from_post
+
+
+class VoteHistoryIndex:
+
+    def __init__(self):
+        """Votes of the vote history grouped by voter and by voted player,
+        with the thread anchor of each vote already computed. Vote history
+        requests read one player's entries instead of scanning the history.
+        """
+        # lowercased voter -> voted player -> anchors of the posts with those votes
+        self._by_voter  = collections.defaultdict(dict)
+        # lowercased voted player -> voter -> anchors
+        self._by_target = collections.defaultdict(dict)
+
+
+    def add(self, voted_as:str, public_name:str, post_id:int):
+        """Index a vote of the vote history.
+
+        Args:
+            voted_as (str): The name the voter used.
+            public_name (str): The name of the voted player.
+            post_id (int): The post where the vote was casted.
+        """
+        post_id = int(post_id)
+        anchor  = (post_id, f"{get_page_number_from_post(post_id)}#{post_id}")
+
+        self._by_voter[str(voted_as).lower()].setdefault(public_name, []).append(anchor)
+        self._by_target[str(public_name).lower()].setdefault(voted_as, []).append(anchor)
+
+
+    def get_votes(self, player:str, is_voter:bool) -> list:
+        """Get the votes casted by or to a player, grouped by the other player.
+        Without an exact match, like the vote history search always did, the
+        player is looked up by part of their name: the names starting with it
+        or, if none, the names containing it, merged together.
+
+        Args:
+            player (str): The player, or part of their name, in any casing.
+            is_voter (bool): True for the votes casted by the player, False for the votes casted to them.
+
+        Returns:
+            list: (other player, anchors) tuples, the most repeated first. Each anchor is a (post id, "page#post id") tuple.
+        """
+        index = self._by_voter if is_voter else self._by_target
+        key   = player.lower()
+
+        if key in index:
+            return sorted(index[key].items(), key=lambda votes: len(votes[1]), reverse=True)
+
+        if len(key) == 0:
+            return []
+
+        names = [name for name in index if name.startswith(key)] or [name for name in index if key in name]
+
+        grouped = dict()
+
+        for name in names:
+            for other_player, anchors in index[name].items():
+                grouped.setdefault(other_player, []).extend(anchors)
+
+        for anchors in grouped.values():
+            anchors.sort()
+
+        return sorted(grouped.items(), key=lambda votes: len(votes[1]), reverse=True)
+
+
+    def get_players(self, is_voter:bool) -> list:
+        """Get every indexed voter (or voted player), lowercased."""
+        return list(self._by_voter if is_voter else self._by_target)
@@ -0,0 +1,120 @@
+import bisect
+
+
+class VoteLeaderboard:
+
+    def __init__(self):
+        """Vote counts per player, bucketed by count. Votes and unvotes move a
+        player between two buckets, and the leader and ties are read from the
+        highest bucket without recounting the vote table.
+
+        Players are bucketed a second time by their votes minus their lynch
+        modifier, so the players closest to majority are read the same way.
+        """
+        # player -> current votes
+        self._counts = dict()
+
+        # player -> extra votes they need to be lynched (mod_to_lynch)
+        self._modifiers = dict()
+
+        # votes -> players with that many votes, in the order they reached it,
+        # and the distinct vote counts with at least one player, ascending
+        self._buckets, self._levels = dict(), list()
+
+        # Same, by votes minus the lynch modifier
+        self._majority_buckets, self._majority_levels = dict(), list()
+
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+    def increment(self, player:str):
+        """Add a vote to a player."""
+        self._move(player, self._counts.get(player, 0) + 1)
+
+
+    def decrement(self, player:str):
+        """Remove a vote from a player. Players without votes leave the leaderboard."""
+        if player in self._counts:
+            self._move(player, self._counts[player] - 1)
+
+
+    def set_modifier(self, player:str, modifier:int):
+        """Set how many extra votes a player needs to be lynched.
+
+        Args:
+            player (str): The player.
+            modifier (int): The lynch modifier of the player. Negative values mean fewer votes.
+        """
+        votes = self._counts.get(player, 0)
+
+        if votes > 0:
+            self._remove(self._majority_buckets, self._majority_levels, votes - self._modifiers.get(player, 0), player)
+
+        self._modifiers[player] = modifier
+
+        if votes > 0:
+            self._add(self._majority_buckets, self._majority_levels, votes - modifier, player)
+
+
+    def get_count(self, player:str) -> int:
+        """Get the current votes of a player."""
+        return self._counts.get(player, 0)
+
+
+    def get_leaders(self) -> list:
+        """Get the players with the most votes.
+
+        Returns:
+            list: The most voted players. More than one means a tie. Empty if there are no votes.
+        """
+        if len(self._levels) == 0:
+            return []
+
+        return list(self._buckets[self._levels[-1]])
+
+
+    def get_closest_to_majority(self) -> tuple:
+        """Get the voted players needing the fewest votes to be lynched.
+
+        Returns:
+            tuple: The closest players, in the order they got there, and their votes
+            minus their lynch modifier. ([], 0) if there are no votes.
+        """
+        if len(self._majority_levels) == 0:
+            return ([], 0)
+
+        return (list(self._majority_buckets[self._majority_levels[-1]]), self._majority_levels[-1])
+
+
+    def _move(self, player:str, votes:int):
+        previous = self._counts.pop(player, 0)
+        modifier = self._modifiers.get(player, 0)
+
+        if previous > 0:
+            self._remove(self._buckets, self._levels, previous, player)
+            self._remove(self._majority_buckets, self._majority_levels, previous - modifier, player)
+
+        if votes > 0:
+            self._counts[player] = votes
+
+            self._add(self._buckets, self._levels, votes, player)
+            self._add(self._majority_buckets, self._majority_levels, votes - modifier, player)
+
+
+    def _add(self, buckets:dict, levels:list, level:int, player:str):
+        if level not in buckets:
+            buckets[level] = dict()
+            bisect.insort(levels, level)
+
+        buckets[level][player] = None
+
+
+    def _remove(self, buckets:dict, levels:list, level:int, player:str):
+        bucket = buckets[level]
+        del bucket[player]
+
+        if len(bucket) == 0:
+            del buckets[level]
+            del levels[bisect.bisect_left(levels, level)]
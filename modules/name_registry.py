@@ -0,0 +1,48 @@
+class NameRegistry:
+
+    def __init__(self, players:list, staff:list):
+        """Map lowercased player ids to the names shown in the game thread.
+        The map is built once and only changes when a player joins the roster.
+
+        Args:
+            players (list): The properly cased names of the players.
+            staff (list): The game staff. They are shown as GM.
+        """
+        self._names = {player.lower(): player for player in players}
+        self._names.update({member.lower(): 'GM' for member in staff})
+        self._names.update({'no_lynch': 'No linchamiento'})
+
+
+    def __contains__(self, player:str) -> bool:
+        return player.lower() in self._names
+
+
+    def __getitem__(self, player:str) -> str:
+        return self._names[player.lower()]
+
+
+    def get(self, player:str, default:str=None) -> str:
+        """Get the display name of a player.
+
+        Args:
+            player (str): The player, in any casing.
+            default (str, optional): Returned if the player is unknown. Defaults to None.
+
+        Returns:
+            str: The properly cased name, GM for the staff.
+        """
+        return self._names.get(player.lower(), default)
+
+
+    def add(self, player:str):
+        """Add a player joining the roster, i.e. a substitute.
+
+        Args:
+            player (str): The properly cased name of the player.
+        """
+        self._names[player.lower()] = player
+
+
+    def to_dict(self) -> dict:
+        """Get the registry as a dict of lowercased ids to display names. Do not modify it."""
+        return self._names
@@ -0,0 +1,298 @@
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+
+class PostRejected(Exception):
+    """Raised by the post function when the forum refuses a message, so
+    posting it again as it is cannot succeed."""
+
+
+class Outbox:
+
+    def __init__(self, outbox_file:str="outbox.jsonl", retry_delay:float=30, max_retry_delay:float=900):
+        """Durable queue of the messages the bot has to post. Messages are
+        journaled to disk when queued and posted by a background worker, so
+        resolving the game never waits for the forum.
+
+        Every thread has its own queue, posted in order. A thread whose post
+        fails is retried later without blocking the other threads, waiting
+        twice as long after each failure, up to max_retry_delay. Messages are
+        never dropped because of a failure. Only a message the forum rejects
+        (PostRejected) leaves the queue: its key is forgotten, so the game can
+        queue it again, and it is reported through pop_rejected().
+
+        Every message carries an idempotency key, i.e. "lynch:alice:1234".
+        A key is only ever queued once, so checking if something was already
+        announced is a local lookup, even across restarts.
+
+        Args:
+            outbox_file (str, optional): The outbox journal, one JSON record per line. Defaults to "outbox.jsonl".
+            retry_delay (float, optional): Seconds to wait before retrying a failed post. Defaults to 30.
+            max_retry_delay (float, optional): Max. seconds to wait between two attempts. Defaults to 900.
+        """
+        self.outbox_file     = outbox_file
+        self.retry_delay     = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # key -> "queued" or "sent"
+        self._status  = dict()
+        # thread id -> queued messages of the thread
+        self._pending = collections.OrderedDict()
+        # thread id -> time.monotonic() of the next attempt after a failure
+        self._retry_at = dict()
+        # key -> failed posting attempts
+        self._attempts = collections.Counter()
+        # thread id -> keys of the rejected messages not reported yet
+        self._rejected = collections.defaultdict(list)
+
+        self._condition = threading.Condition()
+        self._worker    = None
+        self._post      = None
+        self._loaded    = False
+
+
+    def start(self, post_function):
+        """Start posting the queued messages in the background.
+
+        Args:
+            post_function (callable): Called as post_function(thread_id=..., message=...) for each message.
+        """
+        self._post = post_function
+
+        with self._condition:
+            self._load()
+
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="outbox", daemon=True)
+            self._worker.start()
+
+
+    def enqueue(self, key:str, thread_id:int, message:str, item_keys:list=None) -> bool:
+        """Queue a message unless its key was already queued.
+
+        Args:
+            key (str): The idempotency key of the message.
+            thread_id (int): The thread to post in.
+            message (str): The message body.
+            item_keys (list, optional): The keys of the items bundled in the message, tracked like the message key.
+
+        Returns:
+            bool: True if the message was queued, False if the key is known.
+        """
+        with self._condition:
+            self._load()
+
+            if key in self._status:
+                logging.info(f"Skipping already queued message {key}")
+                return False
+
+            entry = {"key": key, "thread_id": thread_id, "message": message, "status": "queued", "item_keys": item_keys or []}
+
+            self._append(entry)
+            self._set_status(entry, "queued")
+            self._pending.setdefault(thread_id, collections.deque()).append(entry)
+
+            self._condition.notify()
+
+        return True
+
+
+    def contains(self, key:str) -> bool:
+        """Check if a message was queued or sent."""
+        with self._condition:
+            self._load()
+            return key in self._status
+
+
+    def was_sent(self, key:str) -> bool:
+        """Check if a message was already posted."""
+        with self._condition:
+            self._load()
+            return self._status.get(key) == "sent"
+
+
+    def pop_rejected(self, thread_id:int) -> list:
+        """Get the keys of the messages of a thread the forum rejected since the last call.
+
+        Args:
+            thread_id (int): The thread id.
+
+        Returns:
+            list: The keys of the rejected messages, in the order they were rejected.
+        """
+        with self._condition:
+            self._load()
+            return self._rejected.pop(thread_id, [])
+
+
+    def wait_until_empty(self, timeout:float=None) -> bool:
+        """Block until every queued message is posted.
+
+        Args:
+            timeout (float, optional): Max. seconds to wait. Defaults to None, no limit.
+
+        Returns:
+            bool: True if the outbox is empty.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not any(self._pending.values()), timeout=timeout)
+
+
+    def _run(self):
+        while True:
+            with self._condition:
+                entry, wait = self._get_next_entry()
+
+                while entry is None:
+                    self._condition.wait(timeout=wait)
+                    entry, wait = self._get_next_entry()
+
+            thread_id = entry["thread_id"]
+
+            try:
+                self._post(thread_id=thread_id, message=entry["message"])
+            except PostRejected:
+                logging.exception(f"The forum rejected {entry['key']}. Forgetting it.")
+
+                with self._condition:
+                    self._finish(entry, "rejected")
+
+                continue
+            except Exception:
+                with self._condition:
+                    self._attempts[entry["key"]] += 1
+
+                    attempts    = self._attempts[entry["key"]]
+                    retry_delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+                    self._retry_at[thread_id] = time.monotonic() + retry_delay
+
+                logging.exception(f"Could not post {entry['key']} ({attempts} attempts). Retrying in {retry_delay:.0f} seconds.")
+                continue
+
+            with self._condition:
+                self._finish(entry, "sent")
+
+            logging.info(f"Posted {entry['key']}")
+
+
+    def _get_next_entry(self) -> tuple:
+        """Get the first message of a thread not waiting to retry.
+
+        Returns:
+            tuple: The message entry, or None and the seconds until a thread can be retried (None to wait for a new message).
+        """
+        now  = time.monotonic()
+        wait = None
+
+        for thread_id, queue in self._pending.items():
+            if len(queue) == 0:
+                continue
+
+            retry_at = self._retry_at.get(thread_id, 0)
+
+            if retry_at <= now:
+                return queue[0], None
+
+            wait = retry_at - now if wait is None else min(wait, retry_at - now)
+
+        return None, wait
+
+
+    def _finish(self, entry:dict, status:str):
+        ## Must be called holding the condition
+        self._append({"key": entry["key"], "thread_id": entry["thread_id"], "item_keys": entry["item_keys"], "status": status})
+        self._set_status(entry, status)
+
+        self._pending[entry["thread_id"]].popleft()
+        self._retry_at.pop(entry["thread_id"], None)
+        self._attempts.pop(entry["key"], None)
+
+        ## Take turns between the threads
+        self._pending.move_to_end(entry["thread_id"])
+
+        self._condition.notify_all()
+
+
+    def _set_status(self, entry:dict, status:str):
+        ## Rejected messages, and those older versions dropped as "failed", are
+        ## forgotten so they can be queued again
+        for key in [entry["key"]] + entry.get("item_keys", []):
+            if status in ("rejected", "failed"):
+                self._status.pop(key, None)
+            else:
+                self._status[key] = status
+
+        rejected = self._rejected.get(entry.get("thread_id"), [])
+
+        if status == "rejected":
+            self._rejected[entry["thread_id"]].append(entry["key"])
+        elif entry["key"] in rejected:
+            rejected.remove(entry["key"])
+
+
+    def _load(self):
+        ## The journal is read once, on first use
+        if self._loaded:
+            return
+
+        self._loaded = True
+
+        if not os.path.isfile(self.outbox_file):
+            return
+
+        queued = dict()
+
+        with open(self.outbox_file, encoding="utf-8") as outbox:
+            for line in outbox:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                self._set_status(entry, entry["status"])
+
+                if entry["status"] == "queued":
+                    queued[entry["key"]] = entry
+                else:
+                    queued.pop(entry["key"], None)
+
+        for entry in queued.values():
+            entry.setdefault("item_keys", [])
+            self._pending.setdefault(entry["thread_id"], collections.deque()).append(entry)
+
+        ## Compact the journal: sent messages only need their key, rejected ones
+        ## their thread until they are reported
+        temp_file = f"{self.outbox_file}.tmp"
+
+        with open(temp_file, "w", encoding="utf-8") as outbox:
+            for key, status in self._status.items():
+                if status == "sent":
+                    outbox.write(json.dumps({"key": key, "status": status}, ensure_ascii=False) + "\n")
+
+            for thread_id, keys in self._rejected.items():
+                for key in keys:
+                    outbox.write(json.dumps({"key": key, "thread_id": thread_id, "status": "rejected"}, ensure_ascii=False) + "\n")
+
+            for queue in self._pending.values():
+                for entry in queue:
+                    outbox.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        os.replace(temp_file, self.outbox_file)
+
+        if len(queued) > 0:
+            logging.info(f"Resuming {len(queued)} unsent messages from the outbox")
+
+
+    def _append(self, entry:dict):
+        with open(self.outbox_file, "a", encoding="utf-8") as outbox:
+            outbox.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            outbox.flush()
+            os.fsync(outbox.fileno())
+
+
+## Shared outbox
+outbox = Outbox()
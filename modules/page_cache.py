@@ -0,0 +1,154 @@
+import collections
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+## Bump when the game actions parsing or the GameAction class change, so that
+## pages parsed by an older bot version are parsed again
+CACHE_VERSION = 2
+
+
+class PageCache:
+
+    def __init__(self, cache_dir:str="page_cache", max_pages:int=256, max_disk_pages:int=2048):
+        """Cache of parsed game actions for the game thread pages that cannot
+        change anymore. A page holding all its posts never changes (edits are
+        ignored by the bot), so it only needs to be downloaded and parsed once.
+
+        Pages are kept in memory as a LRU and backed by pickle files on disk,
+        so that a restart does not download them again.
+
+        Args:
+            cache_dir (str, optional): The folder for the on-disk copies. Defaults to "page_cache".
+            max_pages (int, optional): Max. number of pages kept in memory. Defaults to 256.
+            max_disk_pages (int, optional): Max. number of pages kept on disk. Defaults to 2048.
+        """
+        self.cache_dir      = cache_dir
+        self.max_pages      = max_pages
+        self.max_disk_pages = max_disk_pages
+
+        self._pages = collections.OrderedDict()
+        self._lock  = threading.Lock()
+
+        self.hits, self.misses = 0, 0
+
+
+    def get(self, game_thread:str, page:int):
+        """Get the cached game actions of a page.
+
+        Args:
+            game_thread (str): The game thread.
+            page (int): The page number.
+
+        Returns:
+            list: The list of game actions of the page, or None if the page is not cached.
+        """
+        key = self._get_key(game_thread, page)
+
+        with self._lock:
+            if key in self._pages:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return self._pages[key]
+
+        actions = self._load_from_disk(key)
+
+        with self._lock:
+            if actions is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._add_to_memory(key, actions)
+
+        return actions
+
+
+    def put(self, game_thread:str, page:int, actions:list):
+        """Store the game actions of a complete page.
+
+        Args:
+            game_thread (str): The game thread.
+            page (int): The page number.
+            actions (list): All the game actions of the page.
+        """
+        key = self._get_key(game_thread, page)
+
+        with self._lock:
+            self._add_to_memory(key, actions)
+
+        self._save_to_disk(key, actions)
+
+
+    def clear(self):
+        """Drop every cached page, both from memory and disk."""
+        with self._lock:
+            self._pages.clear()
+
+            if os.path.isdir(self.cache_dir):
+                for cached_file in os.listdir(self.cache_dir):
+                    os.remove(os.path.join(self.cache_dir, cached_file))
+
+
+    def _get_key(self, game_thread:str, page:int) -> str:
+        thread_hash = hashlib.md5(game_thread.encode("utf-8")).hexdigest()[:12]
+        return f"v{CACHE_VERSION}_{thread_hash}_{page}"
+
+
+    def _add_to_memory(self, key:str, actions:list):
+        self._pages[key] = actions
+        self._pages.move_to_end(key)
+
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+
+    def _load_from_disk(self, key:str):
+        cached_file = os.path.join(self.cache_dir, f"{key}.pkl")
+
+        if not os.path.isfile(cached_file):
+            return None
+
+        try:
+            with open(cached_file, "rb") as cached:
+                return pickle.load(cached)
+        except Exception:
+            logging.warning(f"Corrupted page cache entry {cached_file}. Ignoring it.")
+            return None
+
+
+    def _save_to_disk(self, key:str, actions:list):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            cached_file = os.path.join(self.cache_dir, f"{key}.pkl")
+            temp_file   = f"{cached_file}.{threading.get_ident()}.tmp"
+
+            with open(temp_file, "wb") as cached:
+                pickle.dump(actions, cached, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(temp_file, cached_file)
+
+            self._evict_from_disk()
+
+        except OSError:
+            logging.exception(f"Cannot write page {key} to the page cache.")
+
+
+    def _evict_from_disk(self):
+        """Remove the oldest on-disk pages beyond max_disk_pages."""
+        cached_files = [os.path.join(self.cache_dir, cached) for cached in os.listdir(self.cache_dir) if cached.endswith(".pkl")]
+
+        if len(cached_files) > self.max_disk_pages:
+            cached_files.sort(key=os.path.getmtime)
+
+            for old_file in cached_files[:len(cached_files) - self.max_disk_pages]:
+                try:
+                    os.remove(old_file)
+                except OSError:
+                    pass
+
+
+## Shared instance used by the thread readers
+page_cache = PageCache()
@@ -0,0 +1,111 @@
+import logging
+import re
+
+import modules.thread_reader as tr
+from modules.extractors import get_extractor
+from modules.game_stages import GameStage
+from states.stage import Stage
+
+
+class PhaseTracker:
+
+    def __init__(self, game_thread:str, game_master:str):
+        """Keep track of the current game phase by remembering the last phase
+        announced by the game master. Once it is known, each check only parses
+        the GM posts newer than the last one seen, which usually means a single
+        request to the last page of the GM posts.
+
+        Args:
+            game_thread (str): The game thread. Must be from mediavida.com.
+            game_master (str): The name of the player acting as the game master.
+        """
+        self.game_thread = game_thread
+        self.game_master = game_master
+
+        self.last_stage = None
+
+        self._last_seen_post = 0
+        self._gm_pages       = 0
+
+
+    def get_game_phase(self) -> GameStage:
+        """Get the current game phase, parsing only the GM posts published
+        since the last check.
+
+        Returns:
+            GameStage: The last phase announced by the game master.
+        """
+        if self._gm_pages == 0:
+            gm_posts       = tr.get_page_html(f'{self.game_thread}?u={self.game_master}')
+            self._gm_pages = tr.get_page_count_from_page(gm_posts)
+
+        # Reading the last known page also tells us if new pages appeared
+        last_page      = tr.get_page_html(f'{self.game_thread}?u={self.game_master}&pagina={self._gm_pages}')
+        pages_html     = {self._gm_pages: last_page}
+        self._gm_pages = max(self._gm_pages, tr.get_page_count_from_page(last_page))
+
+        self._newest_post = self._last_seen_post
+        self._new_stage   = None
+
+        # We'll start looping from the last page to the previous one
+        for pagenum in range(self._gm_pages, 0, -1):
+
+            request = pages_html.get(pagenum)
+
+            if request is None:
+                request = tr.get_page_html(f'{self.game_thread}?u={self.game_master}&pagina={pagenum}')
+
+            self._new_stage, self._reached_seen = self._find_stage_in_page(request)
+
+            if self._new_stage is not None or self._reached_seen:
+                break
+
+        self._last_seen_post = self._newest_post
+
+        if self._new_stage is not None:
+            logging.info(f'New game phase announced at {self._new_stage.stage_start_post}')
+            self.last_stage = self._new_stage
+
+        if self.last_stage is None:
+            # Default returning when the game has not started. TODO: Improve this
+            return GameStage(post_id=1, game_stage=Stage.Night, stage_start_time=0)
+
+        return self.last_stage
+
+
+    def _find_stage_in_page(self, request_text:str) -> tuple:
+        """Look for the newest phase announcement among the unseen posts of a GM page.
+
+        Args:
+            request_text (str): HTML text of a page of GM posts.
+
+        Returns:
+            tuple: The announced GameStage (or None) and whether an already seen post was reached.
+        """
+        posts        = get_extractor().extract_posts(request_text)
+
+        for post in reversed(posts): # from more recent to older posts
+
+            post_id = post.id
+
+            if post_id <= self._last_seen_post:
+                return (None, True)
+
+            self._newest_post = max(self._newest_post, post_id)
+
+            for pday in post.headers: # all GM h2 headers
+
+                game_end      = re.findall('^Final de la partida', pday)
+                stage_end     = re.findall('^Final del día [0-9]*', pday)
+                stage_start   = re.findall('^Día [0-9]*', pday)
+
+                stage_timestamp     = post.time
+
+                if game_end:
+                    return (GameStage(post_id=post_id, game_stage=Stage.End, stage_start_time=stage_timestamp), False)
+                elif stage_end:
+                    return (GameStage(post_id=post_id, game_stage=Stage.Night, stage_start_time=stage_timestamp), False)
+                elif stage_start:
+                    return (GameStage(post_id=post_id, game_stage=Stage.Day, stage_start_time=stage_timestamp), False)
+
+        return (None, False)
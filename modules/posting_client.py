@@ -0,0 +1,126 @@
+'''
+Needed workaround until robobrowser import bug is fixed
+'''
+import werkzeug
+werkzeug.cached_property  = werkzeug.utils.cached_property
+from robobrowser import RoboBrowser
+
+import logging
+import os
+import pickle
+import threading
+
+import requests
+
+from modules.outbox import PostRejected
+
+
+class PostingClient:
+
+    def __init__(self, cookie_file:str="mv_session.pkl"):
+        """Long-lived, logged in mediavida.com session used to post in the
+        game threads. The bot logs in once, keeps the session cookies on disk
+        between restarts and only logs in again when the session expires.
+
+        Args:
+            cookie_file (str, optional): Where the session cookies are kept. Defaults to "mv_session.pkl".
+        """
+        self.cookie_file = cookie_file
+
+        self._user, self._password = None, None
+        self._browser = None
+        self._lock    = threading.Lock()
+
+        self.logins = 0
+
+
+    def configure(self, user:str, password:str):
+        """Set the bot account credentials.
+
+        Args:
+            user (str): The user id to log into the account.
+            password (str): The password to log into the account.
+        """
+        self._user, self._password = user, password
+
+
+    def post(self, thread_id:int, message:str) -> str:
+        """Post a message in a thread, logging in first only if needed.
+
+        Args:
+            thread_id (int): The thread id.
+            message (str): The message to post.
+
+        Raises:
+            PostRejected: If the thread cannot be posted in, even after logging in again.
+
+        Returns:
+            str: The url after posting.
+        """
+        with self._lock:
+            browser   = self._get_browser()
+            post_form = self._open_post_form(browser, thread_id)
+
+            ## No post form means the session expired
+            if post_form is None:
+                logging.info("Mediavida session expired. Logging in again.")
+                browser   = self._login()
+                post_form = self._open_post_form(browser, thread_id)
+
+                if post_form is None:
+                    raise PostRejected(f"Cannot open the post form of thread {thread_id}. Check the bot credentials.")
+
+            post_form['cuerpo'].value = message
+            browser.submit_form(post_form)
+
+            return browser.url
+
+
+    def _get_browser(self) -> RoboBrowser:
+        if self._browser is not None:
+            return self._browser
+
+        session = requests.Session()
+
+        if os.path.isfile(self.cookie_file):
+            try:
+                with open(self.cookie_file, "rb") as cookies:
+                    session.cookies.update(pickle.load(cookies))
+
+                self._browser = RoboBrowser(session=session, parser="html.parser")
+                logging.info("Reusing the saved mediavida session")
+                return self._browser
+            except Exception:
+                logging.warning("Could not load the saved mediavida session.")
+
+        return self._login()
+
+
+    def _login(self) -> RoboBrowser:
+        self._browser = RoboBrowser(session=requests.Session(), parser="html.parser")
+        self._browser.open('http://m.mediavida.com/login')
+
+        login_form = self._browser.get_form(id='login_form')
+        login_form['name'].value = self._user
+        login_form['password'].value = self._password
+
+        self._browser.submit_form(login_form)
+        self.logins += 1
+
+        temp_file = f"{self.cookie_file}.tmp"
+
+        with open(temp_file, "wb") as cookies:
+            pickle.dump(self._browser.session.cookies, cookies)
+
+        os.replace(temp_file, self.cookie_file)
+
+        return self._browser
+
+
+    def _open_post_form(self, browser:RoboBrowser, thread_id:int):
+        browser.open(f'http://www.mediavida.com/foro/post.php?tid={thread_id}')
+        return browser.get_form(id='postear')
+
+
+## Shared logged in session
+posting_client = PostingClient()
@@ -0,0 +1,251 @@
+'''
+Record and replay mediavida.com traffic, so that whole game days can be
+re-run offline against a local stand-in server.
+
+Capture: set capture_dir in the config. Every page fetched by the thread readers
+and every message the bot would post are stored in that folder. The page cache
+is bypassed while capturing, so complete pages are archived too.
+
+Replay: python -m modules.replay <capture_dir> [--port 8000] [--speed 60]
+and point game_thread to http://127.0.0.1:8000/<thread path>, with dry_run set to 1
+and replay_clock_url set to http://127.0.0.1:8000/__clock so the bot follows the
+simulated time.
+'''
+import argparse
+import bisect
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+class Recorder:
+
+    def __init__(self, archive_dir:str):
+        """Store every fetched page and every posted message into an archive.
+
+        Args:
+            archive_dir (str): The folder holding the archive.
+        """
+        self.archive_dir = archive_dir
+        self._pages_dir  = os.path.join(archive_dir, "pages")
+
+        os.makedirs(self._pages_dir, exist_ok=True)
+
+        self._lock       = threading.Lock()
+        self._page_count = len(os.listdir(self._pages_dir))
+
+
+    def record_page(self, url:str, text:str, captured_at:float=None):
+        """Archive a fetched page.
+
+        Args:
+            url (str): The fetched url.
+            text (str): The page HTML.
+            captured_at (float, optional): Unix epoch time the page is archived at. The pages
+            of a bot iteration share the iteration start, so a replay serves them together.
+            Defaults to now.
+        """
+        with self._lock:
+            self._page_count += 1
+            page_file = os.path.join("pages", f"{self._page_count:07d}.html")
+
+            with open(os.path.join(self.archive_dir, page_file), "w", encoding="utf-8") as page:
+                page.write(text)
+
+            self._append("pages.jsonl", {"time": captured_at if captured_at is not None else time.time(), "url": url, "file": page_file})
+
+
+    def record_post(self, thread_id:int, message:str):
+        """Archive a message posted (or that would have been posted) by the bot.
+
+        Args:
+            thread_id (int): The game thread id.
+            message (str): The message body.
+        """
+        with self._lock:
+            self._append("posts.jsonl", {"time": time.time(), "thread_id": thread_id, "message": message})
+
+
+    def _append(self, file_name:str, entry:dict):
+        with open(os.path.join(self.archive_dir, file_name), "a", encoding="utf-8") as archive:
+            archive.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+## Active recorder, if capture is enabled
+recorder = None
+
+
+def start_capture(archive_dir:str):
+    """Start recording pages and posts into archive_dir.
+
+    Args:
+        archive_dir (str): The folder holding the archive.
+    """
+    global recorder
+    recorder = Recorder(archive_dir)
+    logging.info(f"Capturing mediavida traffic into {archive_dir}")
+
+
+class ReplayArchive:
+
+    def __init__(self, archive_dir:str, speed:float=1):
+        """Serve the pages of a capture as they were at a given simulated time.
+        The simulated clock starts at the first capture and runs speed times
+        faster than the real one, so the thread grows as it did while captured.
+
+        Args:
+            archive_dir (str): The folder holding the archive.
+            speed (float, optional): Simulated seconds per real second. Defaults to 1.
+        """
+        self.archive_dir = archive_dir
+        self.speed       = speed
+
+        ## url key -> (sorted capture times, page files)
+        self._captures = dict()
+        entries_by_url = dict()
+
+        with open(os.path.join(archive_dir, "pages.jsonl"), encoding="utf-8") as pages:
+            for line in pages:
+                entry = json.loads(line)
+                entries_by_url.setdefault(self._get_key(entry["url"]), []).append((entry["time"], entry["file"]))
+
+        for key, entries in entries_by_url.items():
+            entries.sort()
+            self._captures[key] = ([entry[0] for entry in entries], [entry[1] for entry in entries])
+
+        self.start_time  = min(times[0] for times, _ in self._captures.values())
+        self._real_start = time.time()
+
+
+    def get_simulated_time(self) -> float:
+        """Get the current simulated time as Unix epoch."""
+        return self.start_time + (time.time() - self._real_start) * self.speed
+
+
+    def get_page(self, url:str):
+        """Get the last capture of a url at the current simulated time.
+
+        Args:
+            url (str): The requested url. Only the path and the query are used.
+
+        Returns:
+            str: The page HTML, or None if the url was not captured yet at the simulated time.
+        """
+        captures = self._captures.get(self._get_key(url))
+
+        if captures is None:
+            return None
+
+        times, page_files = captures
+        position = bisect.bisect_right(times, self.get_simulated_time())
+
+        # The page did not exist yet, i.e. a thread page with posts from the future
+        if position == 0:
+            return None
+
+        page_file = page_files[position - 1]
+
+        with open(os.path.join(self.archive_dir, page_file), encoding="utf-8") as page:
+            return page.read()
+
+
+    def _get_key(self, url:str) -> str:
+        parsed = urllib.parse.urlsplit(url)
+        return f"{parsed.path}?{parsed.query}" if parsed.query else parsed.path
+
+
+class ReplayClock:
+
+    def __init__(self, clock_url:str):
+        """Follow the simulated clock of a replay server.
+
+        Args:
+            clock_url (str): The /__clock url of the replay server.
+        """
+        self.clock_url = clock_url
+        self.speed     = self._read()["speed"]
+
+
+    def now(self) -> float:
+        """Get the simulated time as Unix epoch."""
+        return self._read()["time"]
+
+
+    def _read(self) -> dict:
+        with urllib.request.urlopen(self.clock_url, timeout=5) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+
+class ReplayHandler(http.server.BaseHTTPRequestHandler):
+
+    archive = None
+
+    def do_GET(self):
+        if self.path == "/__clock":
+            page = json.dumps({"time": self.archive.get_simulated_time(), "speed": self.archive.speed})
+        else:
+            page = self.archive.get_page(self.path)
+
+        if page is None:
+            self.send_error(404)
+            return
+
+        body = page.encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Replay: {format % args}")
+
+
+def serve(archive_dir:str, host:str="127.0.0.1", port:int=8000, speed:float=1):
+    """Start a local HTTP server replaying a capture.
+
+    Args:
+        archive_dir (str): The folder holding the archive.
+        host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on. Defaults to 8000.
+        speed (float, optional): Simulated seconds per real second. Defaults to 1.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server. Call shutdown() to stop it.
+    """
+    handler = type("BoundReplayHandler", (ReplayHandler,), {"archive": ReplayArchive(archive_dir, speed)})
+    server  = http.server.ThreadingHTTPServer((host, port), handler)
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Replaying {archive_dir} on http://{host}:{port} at x{speed}")
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured game thread.")
+    parser.add_argument("archive_dir", help="Folder with the captured pages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--speed", type=float, default=1, help="Simulated seconds per real second")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    server = serve(args.archive_dir, args.host, args.port, args.speed)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
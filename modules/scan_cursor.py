@@ -0,0 +1,81 @@
+import logging
+import os.path
+
+import pandas as pd
+
+from modules.game_store import write_csv_atomic
+from modules.thread_reader import get_page_number_from_post
+
+
+class ScanCursor:
+
+    def __init__(self, file_to_load:str="scan_cursor.csv"):
+        """Keep track of how far the game thread has been parsed during the
+        current day, so that each bot iteration only resolves the new posts.
+
+        Args:
+            file_to_load (str, optional): The file where the cursor is persisted. Defaults to "scan_cursor.csv".
+        """
+        self.day_start_post    = 0
+        self.last_post         = 0
+        self.last_page         = 0
+        self.last_valid_action = 0
+
+        self._cursor_file = file_to_load
+
+        if os.path.isfile(self._cursor_file):
+            try:
+                self._saved = pd.read_csv(self._cursor_file, sep=",").iloc[0]
+
+                self.day_start_post    = int(self._saved["day_start_post"])
+                self.last_post         = int(self._saved["last_post"])
+                self.last_page         = int(self._saved["last_page"])
+                self.last_valid_action = int(self._saved["last_valid_action"])
+            except:
+                logging.warning("Could not load the scan cursor. Starting from scratch.")
+
+
+    def reset(self, day_start_post:int):
+        """Rewind the cursor to the start of a given day.
+
+        Args:
+            day_start_post (int): The post id where the day was announced.
+        """
+        self.day_start_post    = day_start_post
+        self.last_post         = day_start_post
+        self.last_page         = get_page_number_from_post(day_start_post)
+        self.last_valid_action = day_start_post
+
+        logging.info(f"Scan cursor set to the day start at {day_start_post}")
+
+
+    def is_on_day(self, day_start_post:int) -> bool:
+        """Check if the cursor belongs to the day starting at day_start_post.
+
+        Args:
+            day_start_post (int): The post id where the day was announced.
+
+        Returns:
+            bool: True if the cursor tracks that day.
+        """
+        return self.day_start_post == day_start_post
+
+
+    def advance(self, post_id:int):
+        """Move the cursor forward to a fully processed post. Older posts are ignored.
+
+        Args:
+            post_id (int): The last processed post id.
+        """
+        if post_id > self.last_post:
+            self.last_post = post_id
+            self.last_page = get_page_number_from_post(post_id)
+
+
+    def save(self):
+        """Persist the cursor to disk."""
+        write_csv_atomic(pd.DataFrame([{"day_start_post": self.day_start_post,
+                                        "last_post": self.last_post,
+                                        "last_page": self.last_page,
+                                        "last_valid_action": self.last_valid_action}]), self._cursor_file)
+
@@ -0,0 +1,96 @@
+import logging
+
+
+class PollScheduler:
+
+    def __init__(self, base_interval:int, min_interval:int, max_interval:int, stage_end_margin:int=2):
+        """Decide how long the bot should sleep between iterations. The interval
+        shrinks when the thread is busy, backs off while it is idle or during the
+        night, and never sleeps past the end of the current stage.
+
+        Args:
+            base_interval (int): Seconds between iterations with one post per minute.
+            min_interval (int): Lower bound for the interval.
+            max_interval (int): Upper bound for the interval.
+            stage_end_margin (int, optional): Seconds to wait after the end of a stage. Defaults to 2.
+        """
+        self.base_interval    = base_interval
+        self.min_interval     = min(min_interval, base_interval)
+        self.max_interval     = max(max_interval, base_interval)
+        self.stage_end_margin = stage_end_margin
+
+        self.interval         = base_interval
+        self.posts_per_minute = None
+
+        self._last_post  = None
+        self._last_time  = None
+        self._stage_post = None
+
+
+    def set_stage(self, stage_start_post:int):
+        """Start measuring the thread activity again when a new stage begins,
+        so that a day is not measured over the gap of the previous night.
+
+        Args:
+            stage_start_post (int): The post id where the current stage was announced.
+        """
+        if stage_start_post == self._stage_post:
+            return
+
+        self._stage_post      = stage_start_post
+        self._last_post       = None
+        self._last_time       = None
+        self.posts_per_minute = None
+        self.interval         = self.base_interval
+
+
+    def record_activity(self, last_post:int, current_time:float):
+        """Update the thread activity with the last post seen in this iteration.
+
+        Args:
+            last_post (int): The id of the last post of the game thread.
+            current_time (float): Unix epoch time of the check.
+        """
+        if self._last_post is not None and current_time > self._last_time:
+            self._new_posts       = max(0, last_post - self._last_post)
+            self.posts_per_minute = self._new_posts * 60 / (current_time - self._last_time)
+
+        self._last_post = last_post
+        self._last_time = current_time
+
+
+    def get_next_interval(self, current_time:float, stage_end:float=None, is_idle:bool=False) -> float:
+        """Get the seconds to sleep until the next iteration.
+
+        Args:
+            current_time (float): Unix epoch time.
+            stage_end (float, optional): Unix epoch time of the end of the current stage.
+            is_idle (bool, optional): True if nothing is expected to happen (night, majority reached). Defaults to False.
+
+        Returns:
+            float: Seconds until the next iteration.
+        """
+        if is_idle:
+            self.interval = self.max_interval
+
+        elif self.posts_per_minute is None:
+            # No activity measured yet in this stage
+            self.interval = self.base_interval
+
+        elif self.posts_per_minute > 0:
+            self.interval = self.base_interval / self.posts_per_minute
+
+        else:
+            # Quiet thread, back off a bit more each time
+            self.interval = self.interval * 1.5
+
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+
+        next_interval = self.interval
+
+        ## Wake up right after the end of the stage
+        if stage_end is not None and 0 < stage_end - current_time < next_interval:
+            next_interval = stage_end - current_time + self.stage_end_margin
+            logging.info(f'Stage ends in {stage_end - current_time:.0f} seconds. Waking up just after it.')
+
+        return next_interval
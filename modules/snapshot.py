@@ -0,0 +1,42 @@
+import logging
+import pickle
+
+from modules.game_store import store
+
+## Bump when the pickled objects change in an incompatible way
+SNAPSHOT_VERSION = 4
+
+
+def save_snapshot(state:dict):
+    """Write the in-process day state to the game store. It becomes durable
+    with the next store flush, in the same transaction as the game tables,
+    so the snapshot and the tables never disagree after a crash.
+
+    Args:
+        state (dict): The objects to persist, i.e. the day state of the vote count and the players, and the scan cursor.
+    """
+    store.save_blob("snapshot", pickle.dumps({"version": SNAPSHOT_VERSION, "state": state}, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_snapshot() -> dict:
+    """Load the day state written by save_snapshot.
+
+    Returns:
+        dict: The persisted objects, or None if there is no usable snapshot.
+    """
+    data = store.load_blob("snapshot")
+
+    if data is None:
+        return None
+
+    try:
+        saved = pickle.loads(data)
+    except Exception:
+        logging.warning("Could not load the state snapshot. Rebuilding the state from scratch.")
+        return None
+
+    if saved.get("version") != SNAPSHOT_VERSION:
+        logging.info("Ignoring a state snapshot from another bot version.")
+        return None
+
+    return saved["state"]
@@ -0,0 +1,220 @@
+import collections
+import itertools
+
+import pandas as pd
+
+from modules.leaderboard import VoteLeaderboard
+
+## Columns of the vote table, in order
+VOTE_COLUMNS = ["player", "public_name", "voted_by", "voted_as", "post_id", "post_time", "bot_cycle"]
+
+## Vote table versions, unique across every VoteEngine of the process
+_versions = itertools.count(1)
+
+
+class VoteEngine:
+
+    def __init__(self):
+        """In-memory vote table indexed by voter and victim. Votes, unvotes
+        and majority checks are constant time; a DataFrame is only built when
+        the table has to be rendered or saved.
+
+        Every change gets a new version, unique in the process, so the state of
+        the votes is compared without reading them.
+        """
+        # vote id -> vote. Dicts keep insertion order, which is the cast order.
+        self._votes = dict()
+
+        # voter -> ordered list of vote ids casted by them
+        self._by_voter = collections.defaultdict(list)
+
+        # Votes per victim, ordered by count
+        self.leaderboard  = VoteLeaderboard()
+        self._pair_counts = collections.Counter()
+
+        # victim -> public name used in their last vote
+        self._public_names = dict()
+
+        self._next_id = 0
+
+        self._table_cache = None
+        self.version      = next(_versions)
+
+
+    def __len__(self) -> int:
+        return len(self._votes)
+
+
+    def __setstate__(self, state:dict):
+        ## Versions restart with the process, so a restored engine takes a new one
+        self.__dict__.update(state)
+
+        self._table_cache = None
+        self.version      = next(_versions)
+
+
+    def add_vote(self, player:str, victim:str, post_id:int, post_time:int, victim_alias:str, voted_as:str, bot_cycle:int) -> dict:
+        """Append a new vote.
+
+        Args:
+            player (str): The (lowercased) player casting the vote.
+            victim (str): The (lowercased) player receiving the vote.
+            post_id (int): The post number where the vote was casted.
+            post_time (int): The UNIX epoch time of the post where the vote was casted.
+            victim_alias (str): The real name (properly cased) of the player receiving the vote.
+            voted_as (str): The vote alias of the player casting the vote.
+            bot_cycle (int): The bot iteration where the vote was parsed.
+
+        Returns:
+            dict: The new vote, as a vote table row.
+        """
+        vote = {"player": victim,
+                "public_name": victim_alias,
+                "voted_by": player,
+                "voted_as": voted_as,
+                "post_id": post_id,
+                "post_time": post_time,
+                "bot_cycle": bot_cycle}
+
+        vote_id = self._next_id
+        self._next_id += 1
+
+        self._votes[vote_id] = vote
+        self._index(vote_id)
+
+        self._changed()
+
+        return vote
+
+
+    def remove_oldest_vote(self, player:str, victim:str="none"):
+        """Remove the oldest vote casted by player.
+
+        Args:
+            player (str): The player who removes the vote.
+            victim (str, optional): The unvoted player. "none" removes the oldest vote no matter the victim.
+
+        Returns:
+            dict: The removed vote, or None if there was no such vote.
+        """
+        for vote_id in self._by_voter.get(player, []):
+            if victim == "none" or self._votes[vote_id]["player"] == victim:
+                return self._drop(vote_id)
+
+        return None
+
+
+    def remove_player(self, player:str):
+        """Remove every vote casted by or to a player.
+
+        Args:
+            player (str): The player to remove.
+        """
+        for vote_id in [vote_id for vote_id, vote in self._votes.items() if vote["player"] == player or vote["voted_by"] == player]:
+            self._drop(vote_id)
+
+
+    def replace_player(self, replaced:str, replaced_by:str):
+        """Transfer every vote casted by or to a player to their substitute.
+
+        Args:
+            replaced (str): The replaced player.
+            replaced_by (str): The substitute.
+        """
+        for vote_id, vote in list(self._votes.items()):
+
+            if vote["player"] == replaced or vote["voted_by"] == replaced:
+
+                self._unindex(vote_id)
+
+                if vote["player"] == replaced:
+                    vote["player"], vote["public_name"] = replaced_by, replaced_by
+
+                if vote["voted_by"] == replaced:
+                    vote["voted_by"], vote["voted_as"] = replaced_by, replaced_by
+
+                self._index(vote_id)
+
+        # Keep the per voter lists in cast order
+        for voter in self._by_voter:
+            self._by_voter[voter].sort()
+
+        self._changed()
+
+
+    def count_votes_by(self, player:str) -> int:
+        """Count current votes casted by a player."""
+        return len(self._by_voter.get(player, []))
+
+
+    def count_votes_on(self, victim:str) -> int:
+        """Count current votes casted to a player."""
+        return self.leaderboard.get_count(victim)
+
+
+    def has_vote(self, player:str, victim:str) -> bool:
+        """Check if player currently votes victim."""
+        return self._pair_counts.get((player, victim), 0) > 0
+
+
+    def get_public_name(self, victim:str) -> str:
+        """Get the public name shown for a voted player, or None if they have no votes."""
+        return self._public_names.get(victim) if self.leaderboard.get_count(victim) > 0 else None
+
+
+    def get_voters(self) -> list:
+        """Get the players with at least one current vote, in order of first vote."""
+        return [voter for voter, vote_ids in self._by_voter.items() if len(vote_ids) > 0]
+
+
+    def count_votes_since(self, post_id:int) -> int:
+        """Count current votes casted after a given post."""
+        return sum(1 for vote in self._votes.values() if vote["post_id"] > post_id)
+
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Get the current votes as a vote table. The table is cached until the next change.
+
+        Returns:
+            pd.DataFrame: The vote table, in cast order. Its "vote_version" attr is the current version.
+        """
+        if self._table_cache is None:
+            self._table_cache = pd.DataFrame(list(self._votes.values()), columns=VOTE_COLUMNS)
+            self._table_cache.attrs["vote_version"] = self.version
+
+        return self._table_cache
+
+
+    def _drop(self, vote_id:int) -> dict:
+        self._unindex(vote_id)
+        self._changed()
+        return self._votes.pop(vote_id)
+
+
+    def _changed(self):
+        self._table_cache = None
+        self.version      = next(_versions)
+
+
+    def _index(self, vote_id:int):
+        vote = self._votes[vote_id]
+
+        self._by_voter[vote["voted_by"]].append(vote_id)
+        self.leaderboard.increment(vote["player"])
+        self._public_names[vote["player"]] = vote["public_name"]
+        self._pair_counts[(vote["voted_by"], vote["player"])] += 1
+
+
+    def _unindex(self, vote_id:int):
+        vote = self._votes[vote_id]
+
+        self._by_voter[vote["voted_by"]].remove(vote_id)
+        self.leaderboard.decrement(vote["player"])
+        self._decrease(self._pair_counts, (vote["voted_by"], vote["player"]))
+
+
+    def _decrease(self, counter:collections.Counter, key):
+        counter[key] -= 1
+
+        if counter[key] <= 0:
+            del counter[key]
@@ -0,0 +1,111 @@
+import bisect
+import collections
+import math
+
+
+class VoteIntervals:
+
+    def __init__(self):
+        """Lifetimes of the votes of the vote history, as [post_id, unvoted_at)
+        intervals sorted by the post where they were casted. Finding the votes
+        alive at a given post of a day is a binary search plus a scan of that
+        day, instead of several masks over the whole history.
+        """
+        # (post_id, row) sorted by post_id. Rows are positions in the vote history.
+        self._by_start = list()
+
+        # row -> [post_id, unvoted_at, voted_by, player]. unvoted_at is 0 while the vote is alive.
+        self._intervals = dict()
+
+        # voter -> rows of their votes not unvoted yet, in cast order
+        self._open_by_voter = collections.defaultdict(list)
+
+        # (voter, unvoted_at) -> rows added as already unvoted, i.e. loaded from the history
+        self._closed_at = collections.defaultdict(list)
+
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+
+    def add(self, row:int, post_id:int, unvoted_at:int, voted_by:str, player:str):
+        """Add the lifetime of a vote.
+
+        Args:
+            row (int): The position of the vote in the vote history.
+            post_id (int): The post where the vote was casted.
+            unvoted_at (int): The post where the vote was removed, 0 if still alive.
+            voted_by (str): The player who casted the vote.
+            player (str): The voted player.
+        """
+        post_id, unvoted_at = int(post_id), int(unvoted_at)
+
+        self._intervals[row] = [post_id, unvoted_at, voted_by, player]
+
+        # Votes mostly arrive in post order, so this is usually an append
+        if len(self._by_start) == 0 or self._by_start[-1] <= (post_id, row):
+            self._by_start.append((post_id, row))
+        else:
+            bisect.insort(self._by_start, (post_id, row))
+
+        if unvoted_at == 0:
+            self._open_by_voter[voted_by].append(row)
+        else:
+            self._closed_at[(voted_by, unvoted_at)].append(row)
+
+
+    def close(self, voted_by:str, player:str, unvoted_at:int, since:int):
+        """End the oldest alive vote of a player casted between two posts.
+
+        Args:
+            voted_by (str): The player who removes the vote.
+            player (str): The unvoted player. "none" ends the oldest vote no matter the victim.
+            unvoted_at (int): The post where the vote was removed.
+            since (int): The first post of the day. Older votes are ignored.
+
+        Returns:
+            int: The vote history row of the ended vote, or None if there was no such vote.
+        """
+        ## An unvote resolved again, i.e. when replaying the day, ends the same vote
+        closed_rows = self._closed_at.get((voted_by, int(unvoted_at)), [])
+
+        for position, row in enumerate(closed_rows):
+            if player == "none" or self._intervals[row][3] == player:
+                del closed_rows[position]
+                return row
+
+        open_rows = self._open_by_voter.get(voted_by, [])
+
+        for position, row in enumerate(open_rows):
+            interval = self._intervals[row]
+
+            if since <= interval[0] <= unvoted_at and (player == "none" or interval[3] == player):
+                interval[1] = int(unvoted_at)
+                del open_rows[position]
+                return row
+
+        return None
+
+
+    def alive_at(self, post_id:int, since:int) -> list:
+        """Find the votes alive at a given post.
+
+        Args:
+            post_id (int): The post to look at.
+            since (int): The first post of the day. Older votes are ignored.
+
+        Returns:
+            list: The vote history rows of the alive votes, in history order.
+        """
+        first = bisect.bisect_left(self._by_start, (since, -math.inf))
+        last  = bisect.bisect_right(self._by_start, (post_id, math.inf))
+
+        alive = list()
+
+        for _, row in self._by_start[first:last]:
+            unvoted_at = self._intervals[row][1]
+
+            if unvoted_at == 0 or unvoted_at > post_id:
+                alive.append(row)
+
+        return sorted(alive)
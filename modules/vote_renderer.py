@@ -0,0 +1,87 @@
+import collections
+import threading
+
+
+class VoteRenderer:
+
+    def __init__(self, max_cached:int=32):
+        """Render the vote ranking of a vote table in a single pass over its
+        rows. Rankings of the current votes are cached by game thread and
+        VoteEngine version, so posting the same vote count again costs a
+        lookup. Other tables, i.e. past vote counts, are always rendered.
+
+        Args:
+            max_cached (int, optional): Max. number of rankings kept. Defaults to 32.
+        """
+        self.max_cached = max_cached
+
+        # (game thread, vote version) -> (ranking, voters)
+        self._cache = collections.OrderedDict()
+        self._lock  = threading.Lock()
+
+
+    def render_ranking(self, vote_table, game_thread:str) -> str:
+        """Get the Markdown ranking of a vote table: one line per voted
+        player, most voted first, with their voters.
+
+        Args:
+            vote_table (pd.DataFrame): A vote table, with public_name, voted_by and voted_as columns.
+            game_thread (str): The game thread url, used to link each player posts.
+
+        Returns:
+            str: The ranking, formatted in Markdown.
+        """
+        return self._render(vote_table, game_thread)[0]
+
+
+    def get_voters(self, vote_table, game_thread:str) -> set:
+        """Get the (lowercased) players casting at least one vote in a vote table."""
+        return self._render(vote_table, game_thread)[1]
+
+
+    def _render(self, vote_table, game_thread:str) -> tuple:
+        version = vote_table.attrs.get("vote_version")
+        state   = (game_thread, version)
+
+        with self._lock:
+            if version is not None and state in self._cache:
+                self._cache.move_to_end(state)
+                return self._cache[state]
+
+        rows = zip(vote_table["public_name"], vote_table["voted_as"], vote_table["voted_by"])
+
+        ## Group the voters of each player, in order of first vote
+        voters_of, voted_by_any = dict(), set()
+
+        for public_name, voted_as, voted_by in rows:
+            voters_of.setdefault(public_name, []).append(voted_as)
+            voted_by_any.add(voted_by)
+
+        ## Most voted first. Ties keep the order of their first vote.
+        ranking = sorted(voters_of.items(), key=lambda player: len(player[1]), reverse=True)
+
+        lines = list()
+
+        for player, voters in ranking:
+
+            if player == 'no_lynch':
+                player = 'No linchamiento'
+
+            lines.append(f'1. [url={game_thread}?u={player}]**{player}**[/url]: {len(voters)} (_{", ".join(voters)}_) \n')
+
+        rendered = ("".join(lines), voted_by_any)
+
+        if version is None:
+            return rendered
+
+        with self._lock:
+            self._cache[state] = rendered
+
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+        return rendered
+
+
+## Shared renderer, so that the cache outlives each User
+renderer = VoteRenderer()
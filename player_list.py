@@ -2,14 +2,21 @@ import logging
 import pandas as pd
 
 import modules.game_actions as actions
+from modules.game_store import store
+from modules.name_registry import NameRegistry
+
 class Players:
     
-    def __init__(self, players: list, bot_cycle:int):
+    def __init__(self, players: list, bot_cycle:int, names: NameRegistry):
+        # Display names, shared with the vote count and the bot messages
+        self.names = names
+
         try:
-            self.attack_table = pd.read_csv("attack_and_defense.csv", sep=",")
+            self.attack_table = store.load_table("attack_and_defense")
         except:
+            ## Placeholder kept in memory only, so that an attack_and_defense.csv added later is imported
             logging.info('Failed to load attack table. Setting all attacks and defense to 0')
-            self.attack_table = pd.DataFrame(self.players, columns = ["player"])
+            self.attack_table = pd.DataFrame(players, columns = ["player"])
             self.attack_table["attack"] = 0
             self.attack_table["defense"] = 0
             self.attack_table["last_shot"] = 0
@@ -17,18 +24,21 @@ class Players:
         self.attack_table.index = self.attack_table["player"].str.lower()
 
         try:
-            self.shots_history = pd.read_csv("shots_history.csv", sep=",")
+            self.shots_history = store.load_table("shots_history").reset_index(drop=True)
+            self.shots_history["survived"] = self.shots_history["survived"].astype(bool)
             self.fallen = self.shots_history.loc[~self.shots_history["survived"], "victim"].tolist()
             self.players =  list(set(players) - set(self.fallen))
         except:
             logging.info("Failed to load shots history. Starting from scratch")
             self.shots_history = pd.DataFrame(columns=["shooter", "victim", "survived", "post_id", "bot_cycle"])
+            store.create_table("shots_history", self.shots_history)
             self.players = list(set(players))
             self.fallen = []
         
         try:
-            self.role_list = pd.read_csv("role_list.csv", sep=",")
+            self.role_list = store.load_table("role_list")
         except:
+            ## Placeholder kept in memory only, so that a role_list.csv added later is imported
             logging.info("Failed to load role list. Setting all roles to unknown")
             self.role_list = pd.DataFrame(self.players, columns = ["player"])
             self.role_list["team"] = "unknown"
@@ -38,6 +48,15 @@ class Players:
 
         self.bot_cycle = bot_cycle
 
+    def get_day_state(self) -> dict:
+        """Get the alive and fallen players. The game tables are reloaded from the game store instead."""
+        return {"players": self.players, "fallen": self.fallen}
+
+    def set_day_state(self, day_state:dict):
+        """Restore the alive and fallen players saved by get_day_state."""
+        self.players = day_state["players"]
+        self.fallen  = day_state["fallen"]
+
     def player_exists(self, player:str):
         if player in self.players:
             return True
@@ -147,7 +166,7 @@ class Players:
         
         self.attack_table.loc[player.lower(), "attack"] = self._new_offense
         logging.info(f"Update {player} attack: {self._last_offense} to {self._new_offense}")
-        self.attack_table.to_csv('attack_and_defense.csv', sep=',', index=False, header=True)
+        store.update_rows("attack_and_defense", values={"attack": self._new_offense}, where={"player": self.attack_table.loc[player.lower(), "player"]})
     
     def reduce_player_defense(self, player:str, offset:int = 1):
         self._last_defense = self.get_player_defense(player)
@@ -158,7 +177,7 @@ class Players:
         
         self.attack_table.loc[player.lower(), "defense"] = self._new_defense
         logging.info(f"Update {player} defense: {self._last_defense} to {self._new_defense}")
-        self.attack_table.to_csv('attack_and_defense.csv', sep=',', index=False, header=True)
+        store.update_rows("attack_and_defense", values={"defense": self._new_defense}, where={"player": self.attack_table.loc[player.lower(), "player"]})
 
     
     def get_player_last_shot(self, player:str):
@@ -200,7 +219,7 @@ class Players:
             self.attack_table.loc[self._shooter.lower(), "last_shot"] = int(self._shot_id)
             # update the table too
             logging.info(f"Update shooting history and table after valid shot for {self._shooter} at {self._shot_id}")
-            self.attack_table.to_csv('attack_and_defense.csv', sep=',', index=False, header=True)
+            store.update_rows("attack_and_defense", values={"last_shot": int(self._shot_id)}, where={"player": self.attack_table.loc[self._shooter.lower(), "player"]})
                         
             self._shot_to_update = pd.Series(
                  {
@@ -214,6 +233,7 @@ class Players:
             if len(self.shots_history) == 0:
                 # update shots history
                 self.shots_history = self.shots_history.append(self._shot_to_update, ignore_index=True)
+                store.insert_row("shots_history", self._shot_to_update.to_dict())
             else:
                 self._columns_to_check = ["shooter", "victim", "survived", "post_id"]
 
@@ -227,8 +247,7 @@ class Players:
                 # Two shots sharing every column adn cycle come from the same user double shooting
                 if not self._already_appended or (self._already_appended and self._same_cycle):
                     self.shots_history = self.shots_history.append(self._shot_to_update, ignore_index=True)
-            
-            self.shots_history.to_csv("shots_history.csv", sep =",", index=False, header=True)
+                    store.insert_row("shots_history", self._shot_to_update.to_dict())
 
 
     def _append_to_attack_table(self, player:str, based_on_player:str):
@@ -244,7 +263,7 @@ class Players:
         self._old_player = self.attack_table.loc[based_on_player].to_dict()
 
         # Change the player name
-        self._old_player['player'] = player
+        self._old_player['player'] = self.names.get(player, player)
 
         # Create a 1 row dataframe whose index is the lowercased player name
         self._new_attack_and_defense = pd.DataFrame(self._old_player, index=[player.lower()])
@@ -252,10 +271,9 @@ class Players:
         # Append it to the end of the vote rights table
         self.attack_table = self.attack_table.append(self._new_attack_and_defense)
 
-        # Just in case the bot closes, let's update the vote_rights. 
-        #TODO: Find  a better way to do this. 
+        if store.has_table("attack_and_defense"):
+            store.insert_row("attack_and_defense", self._old_player)
         logging.info(f'Updated attack table with {player}')
-        self.attack_table.to_csv('attack_and_defense.csv', sep=',', index=False, header=True)
 
     def _append_to_role_list(self, player:str, based_on_player:str):
         """Add a player to the role_list table by copying the role and team of
@@ -270,7 +288,7 @@ class Players:
         self._old_player = self.role_list.loc[based_on_player].to_dict()
 
         # Change the player name
-        self._old_player['player'] = player
+        self._old_player['player'] = self.names.get(player, player)
 
         # Create a 1 row dataframe whose index is the lowercased player name
         self._new_role = pd.DataFrame(self._old_player, index=[player.lower()])
@@ -278,7 +296,6 @@ class Players:
         # Append it to the end of the vote rights table
         self.role_list = self.role_list.append(self._new_role)
 
-        # Just in case the bot closes, let's update the file
-        #TODO: Find  a better way to do this. 
-        logging.info(f'Updated role list with {player}')
-        self.role_list.to_csv('role_list.csv', sep=',', index=False, header=True)
\ No newline at end of file
+        if store.has_table("role_list"):
+            store.insert_row("role_list", self._old_player)
+        logging.info(f'Updated role list with {player}')
\ No newline at end of file
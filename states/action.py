@@ -13,6 +13,7 @@ class Action(enum.Enum):
     reveal         = "revelar"
     vote           = "voto"
     vote_history   = "historial"
+    all_vote_history = "<historial de todos>" ## Set by the historial parser. Commands are split on spaces, so no typed word matches it.
     winner         = "ganador"
     shoot          = "disparo"
     revive         = "reanimar"
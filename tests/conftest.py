@@ -0,0 +1,25 @@
+import os.path
+import sys
+
+import pytest
+
+## The bot modules are imported from the repository root, as main.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.game_store import GameStore, store
+
+
+@pytest.fixture
+def game_store(tmp_path):
+    """A game store of its own for each test, set up with Alice, Bob and Carol."""
+    with open(tmp_path / "vote_config.csv", "w") as config_file:
+        config_file.write("player,can_be_voted,allowed_votes,mod_to_lynch,is_mayor\n")
+        config_file.writelines(f"{player},1,1,0,0\n" for player in ["Alice", "Bob", "Carol"])
+        config_file.write("no_lynch,0,0,0,0\n")
+
+    game_store = GameStore(str(tmp_path / "game_state.db"))
+
+    with store.using(game_store):
+        yield game_store
+
+    game_store.close()
@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("lxml")
+
+import modules.extractors as extractors
+
+PAGE = """
+<html><body>
+<div class="cf post first" data-num="31" data-autor="GameMaster">
+  <span class="rd" data-time="1650000000"></span>
+  <div class="post-contents">
+    <h2>Día 2</h2>
+    <ol>
+      <li><a href="/id/alice">Alice</a></li>
+      <li><a href="/id/bob"><strong>Bob</strong></a></li>
+      <li><a href="/id/carol">Car<em>ol</em></a></li>
+      <li><a href="/id/empty"></a></li>
+    </ol>
+  </div>
+</div>
+<div class="cf post" data-num="32" data-autor="Alice">
+  <span data-time="1650000100"></span>
+  <div class="post-contents">
+    <h4>Voto <a href="/id/bob">Bob</a></h4>
+    <h4>Recuento &amp; más</h4>
+  </div>
+</div>
+<div class="cf post z edit" data-num="33" data-autor="Bob">
+  <div class="post-contents"><h4>Desvoto</h4></div>
+</div>
+<div id="bottompanel"><a>1</a><a>2</a><a><b>7</b></a><a>Siguiente</a></div>
+</body></html>
+"""
+
+
+@pytest.fixture(params=["soup", "lxml"])
+def backend(request):
+    return extractors.BACKENDS[request.param]()
+
+
+def test_extract_posts(backend):
+    posts = backend.extract_posts(PAGE)
+
+    assert [post.id for post in posts] == [31, 32, 33]
+    assert [post.author for post in posts] == ["GameMaster", "Alice", "Bob"]
+    assert [post.time for post in posts] == [1650000000, 1650000100, 0]
+    assert [post.is_thread_post for post in posts] == [True, True, False]
+    assert posts[0].headers == ["Día 2"]
+    assert posts[0].player_list == ["Alice", "Bob", "Carol"]
+    assert posts[1].commands == ["Voto Bob", "Recuento & más"]
+
+
+def test_extract_page_count(backend):
+    assert backend.extract_page_count(PAGE) == 7
+    assert backend.extract_page_count("<html></html>") == 1
+
+
+def test_empty_page(backend):
+    assert backend.extract_posts("") == []
+    assert backend.extract_posts("  \n") == []
+
+
+def test_backends_agree():
+    soup, lxml_backend = extractors.SoupExtractor(), extractors.LxmlExtractor()
+
+    assert soup.extract_posts(PAGE) == lxml_backend.extract_posts(PAGE)
+    assert soup.extract_page_count(PAGE) == lxml_backend.extract_page_count(PAGE)
@@ -0,0 +1,75 @@
+import contextvars
+import threading
+
+from modules.fetcher import Fetcher
+
+
+class Response:
+
+    def __init__(self, text:str):
+        self.text, self.content, self.status_code = text, text.encode("utf-8"), 200
+
+    def raise_for_status(self):
+        pass
+
+
+class Session:
+
+    def __init__(self):
+        self.urls = list()
+
+    def get(self, url:str, timeout:float) -> Response:
+        self.urls.append(url)
+        return Response(f"page {url}")
+
+    def close(self):
+        pass
+
+
+def get_fetcher() -> Fetcher:
+    fetcher = Fetcher()
+    fetcher.session = Session()
+
+    return fetcher
+
+
+def test_each_tick_has_its_own_memo_and_report():
+    fetcher = get_fetcher()
+    reports = dict()
+
+    def run_game(name:str, pages:int):
+        fetcher.begin_tick()
+
+        for _ in range(3):
+            for page in range(pages):
+                fetcher.get(f"https://mv/{name}/{page}")
+
+        reports[name] = fetcher.get_report()
+        fetcher.end_tick()
+
+    games = [threading.Thread(target=contextvars.copy_context().run, args=(run_game, name, pages))
+             for name, pages in [("a", 1), ("b", 2)]]
+
+    for game in games:
+        game.start()
+
+    for game in games:
+        game.join()
+
+    assert reports["a"].startswith("1 requests (0 failed, 2 saved), 19 bytes")
+    assert reports["b"].startswith("2 requests (0 failed, 4 saved), 38 bytes")
+    assert fetcher.get_report().startswith("3 requests (0 failed, 6 saved), 57 bytes")
+    assert len(fetcher.session.urls) == 3
+
+
+def test_the_session_is_only_rebuilt_when_its_policy_changes():
+    fetcher = get_fetcher()
+    session = fetcher.session
+
+    fetcher.configure(timeout=5, retries=fetcher.retries, pool_size=fetcher.pool_size)
+    assert fetcher.session is session
+    assert fetcher.timeout == 5
+
+    fetcher.configure(pool_size=20)
+    assert fetcher.session is not session
+    assert not hasattr(fetcher, "_rebuild")
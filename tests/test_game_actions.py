@@ -0,0 +1,29 @@
+import modules.game_actions as gm
+import states.action as actions
+
+
+def parse(contents:str) -> gm.GameAction:
+    return gm.GameAction(post_id=10, post_time=600, contents=contents, author="alice")
+
+
+def test_history_of_every_player():
+    action = parse("Historial de todos.")
+
+    assert action.type == actions.Action.all_vote_history
+    assert action.victim == "none"
+
+
+def test_history_of_a_player_named_like_the_request():
+    assert parse("historial todos").type == actions.Action.vote_history
+    assert parse("historial todos").victim == "todos"
+    assert parse("historial de todos ya").type == actions.Action.vote_history
+
+
+def test_the_internal_value_is_not_a_command():
+    assert parse(actions.Action.all_vote_history.value).type != actions.Action.all_vote_history
+
+
+def test_records_keep_the_request():
+    action = gm.GameAction.from_record(parse("historial de todos").to_record())
+
+    assert action.type == actions.Action.all_vote_history
@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+
+import modules.game_actions as gm
+import vote_count
+from modules.game_store import GameStore
+from modules.name_registry import NameRegistry
+
+PLAYERS = ["Alice", "Bob", "Carol"]
+
+
+def get_vote_count(day_start_post:int=1) -> vote_count.VoteCount:
+    return vote_count.VoteCount(staff=["thegm"], day_start_post=day_start_post, bot_cycle=0, n_players=len(PLAYERS),
+                                names=NameRegistry(players=PLAYERS, staff=["thegm"]))
+
+
+def cast(vcount:vote_count.VoteCount, post_id:int, author:str, contents:str):
+    action = gm.GameAction(post_id=post_id, post_time=post_id * 60, contents=contents, author=author)
+
+    if contents.startswith("desvoto"):
+        vcount.unvote_player(action)
+    else:
+        vcount.vote_player(action)
+
+
+def read_mirror(game_store:GameStore, name:str) -> pd.DataFrame:
+    return pd.read_csv(os.path.join(os.path.dirname(game_store.db_file), f"{name}.csv"))
+
+
+def test_only_flush_commits(game_store):
+    vcount = get_vote_count()
+    cast(vcount, 10, "alice", "voto bob")
+
+    ## Another connection does not see the vote nor the imported setup table until the flush
+    reader = GameStore(game_store.db_file)
+    assert not reader.has_table("vote_config")
+
+    game_store.flush()
+    assert len(reader.load_table("vote_history")) == 1
+    reader.close()
+
+
+def test_rollback_and_replay_does_not_duplicate_the_history(game_store):
+    vcount = get_vote_count()
+    cast(vcount, 10, "alice", "voto bob")
+    game_store.flush()
+
+    ## An iteration fails after recording a vote, then the posts are resolved again
+    cast(vcount, 11, "bob", "voto carol")
+    game_store.rollback()
+
+    vcount = get_vote_count()
+    cast(vcount, 11, "bob", "voto carol")
+    game_store.flush()
+
+    history = game_store.load_table("vote_history")
+    assert history["post_id"].tolist() == [10, 11]
+    assert read_mirror(game_store, "vote_history")["post_id"].tolist() == [10, 11]
+
+
+def test_flush_appends_rows_and_rewrites_changed_rows_at_the_end_of_the_day(game_store):
+    vcount = get_vote_count()
+    cast(vcount, 10, "alice", "voto bob")
+    game_store.flush()
+
+    cast(vcount, 12, "alice", "desvoto bob")
+    cast(vcount, 13, "carol", "voto alice")
+    game_store.flush()
+
+    ## The new vote is appended, the unvote waits for the end of the day
+    mirror = read_mirror(game_store, "vote_history")
+    assert mirror["post_id"].tolist() == [10, 13]
+    assert mirror["unvoted_at"].tolist() == [0, 0]
+
+    game_store.flush(rewrite=True)
+
+    mirror = read_mirror(game_store, "vote_history")
+    assert mirror["post_id"].tolist() == [10, 13]
+    assert mirror["unvoted_at"].tolist() == [12, 0]
+
+
+def test_edited_mirror_is_rewritten(game_store):
+    vcount = get_vote_count()
+    cast(vcount, 10, "alice", "voto bob")
+    game_store.flush()
+
+    mirror_file = os.path.join(os.path.dirname(game_store.db_file), "vote_history.csv")
+
+    with open(mirror_file, "a") as history_file:
+        history_file.write("garbage\n")
+
+    os.utime(mirror_file, (0, 0))
+
+    cast(vcount, 11, "bob", "voto carol")
+    game_store.flush()
+
+    assert read_mirror(game_store, "vote_history")["post_id"].tolist() == [10, 11]
@@ -0,0 +1,35 @@
+from modules.history_index import VoteHistoryIndex
+
+
+def get_index() -> VoteHistoryIndex:
+    index = VoteHistoryIndex()
+    index.add(voted_as="Alice", public_name="Bob", post_id=31)
+    index.add(voted_as="Alice", public_name="Bob", post_id=45)
+    index.add(voted_as="Alice", public_name="Carol", post_id=50)
+    index.add(voted_as="Alicia", public_name="Carol", post_id=12)
+    index.add(voted_as="MaliceX", public_name="Bob", post_id=70)
+
+    return index
+
+
+def test_votes_by_and_to_a_player():
+    index = get_index()
+
+    assert index.get_votes("ALICE", is_voter=True) == [("Bob", [(31, "2#31"), (45, "2#45")]),
+                                                       ("Carol", [(50, "2#50")])]
+    assert index.get_votes("carol", is_voter=False) == [("Alice", [(50, "2#50")]), ("Alicia", [(12, "1#12")])]
+    assert sorted(index.get_players(is_voter=True)) == ["alice", "alicia", "malicex"]
+
+
+def test_partial_names_prefer_the_start_of_the_name():
+    index = get_index()
+
+    ## "ali" starts alice and alicia, so malicex is left out
+    assert index.get_votes("ali", is_voter=True) == [("Bob", [(31, "2#31"), (45, "2#45")]),
+                                                     ("Carol", [(12, "1#12"), (50, "2#50")])]
+
+    ## Nothing starts with "lice": fall back to the names containing it
+    assert dict(index.get_votes("lice", is_voter=True))["Bob"] == [(31, "2#31"), (45, "2#45"), (70, "3#70")]
+
+    assert index.get_votes("dave", is_voter=True) == []
+    assert index.get_votes("", is_voter=True) == []
@@ -0,0 +1,52 @@
+from modules.leaderboard import VoteLeaderboard
+
+
+def test_leaders_and_ties():
+    leaderboard = VoteLeaderboard()
+    assert leaderboard.get_leaders() == []
+
+    leaderboard.increment("alice")
+    leaderboard.increment("bob")
+    assert leaderboard.get_leaders() == ["alice", "bob"]
+
+    leaderboard.increment("bob")
+    assert leaderboard.get_leaders() == ["bob"]
+    assert leaderboard.get_count("bob") == 2
+
+    leaderboard.decrement("bob")
+    leaderboard.decrement("bob")
+    assert leaderboard.get_leaders() == ["alice"]
+    assert leaderboard.get_count("bob") == 0
+    assert len(leaderboard) == 1
+
+
+def test_closest_to_majority_follows_the_lynch_modifiers():
+    leaderboard = VoteLeaderboard()
+    leaderboard.set_modifier("alice", 2)
+
+    for _ in range(3):
+        leaderboard.increment("alice")
+
+    leaderboard.increment("bob")
+    leaderboard.increment("bob")
+
+    ## alice has more votes, but needs two more to be lynched
+    assert leaderboard.get_leaders() == ["alice"]
+    assert leaderboard.get_closest_to_majority() == (["bob"], 2)
+
+    leaderboard.set_modifier("alice", 0)
+    assert leaderboard.get_closest_to_majority() == (["alice"], 3)
+
+    leaderboard.set_modifier("bob", -1)
+    assert leaderboard.get_closest_to_majority() == (["alice", "bob"], 3)
+
+
+def test_closest_to_majority_without_votes():
+    leaderboard = VoteLeaderboard()
+    leaderboard.set_modifier("alice", 1)
+
+    assert leaderboard.get_closest_to_majority() == ([], 0)
+
+    leaderboard.increment("alice")
+    leaderboard.decrement("alice")
+    assert leaderboard.get_closest_to_majority() == ([], 0)
@@ -0,0 +1,92 @@
+import threading
+
+from modules.outbox import Outbox, PostRejected
+
+
+class Forum:
+
+    def __init__(self, failures:int=0, rejected:bool=False):
+        self.posts    = list()
+        self.failures = failures
+        self.rejected = rejected
+        self._lock    = threading.Lock()
+
+    def post(self, thread_id:int, message:str):
+        with self._lock:
+            if self.rejected:
+                raise PostRejected(message)
+
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError(message)
+
+            self.posts.append((thread_id, message))
+
+
+def get_outbox(tmp_path) -> Outbox:
+    return Outbox(outbox_file=str(tmp_path / "outbox.jsonl"), retry_delay=0.01, max_retry_delay=0.02)
+
+
+def test_keys_are_queued_once_across_restarts(tmp_path):
+    forum  = Forum()
+    outbox = get_outbox(tmp_path)
+    outbox.start(forum.post)
+
+    assert outbox.enqueue(key="1:votecount:10", thread_id=1, message="count", item_keys=["1:vhistory:alice"])
+    assert outbox.wait_until_empty(timeout=5)
+
+    restarted = get_outbox(tmp_path)
+
+    assert restarted.was_sent("1:votecount:10")
+    assert restarted.contains("1:vhistory:alice")
+    assert not restarted.enqueue(key="1:votecount:10", thread_id=1, message="count")
+    assert forum.posts == [(1, "count")]
+
+
+def test_queued_messages_are_posted_after_a_restart(tmp_path):
+    ## Queued, but the bot stops before the worker posts it
+    get_outbox(tmp_path).enqueue(key="1:lynch:bob:20", thread_id=1, message="lynch")
+
+    forum     = Forum()
+    restarted = get_outbox(tmp_path)
+    restarted.start(forum.post)
+
+    assert restarted.wait_until_empty(timeout=5)
+    assert restarted.was_sent("1:lynch:bob:20")
+    assert forum.posts == [(1, "lynch")]
+
+
+def test_failed_posts_are_retried_until_they_succeed(tmp_path):
+    forum  = Forum(failures=12)
+    outbox = get_outbox(tmp_path)
+    outbox.start(forum.post)
+
+    outbox.enqueue(key="1:votecount:10", thread_id=1, message="count")
+
+    assert outbox.wait_until_empty(timeout=5)
+    assert outbox.was_sent("1:votecount:10")
+    assert forum.posts == [(1, "count")]
+
+
+def test_rejected_posts_are_forgotten_and_reported(tmp_path):
+    forum  = Forum(rejected=True)
+    outbox = get_outbox(tmp_path)
+    outbox.start(forum.post)
+
+    outbox.enqueue(key="1:votecount:10", thread_id=1, message="count", item_keys=["1:vhistory:alice"])
+    assert outbox.wait_until_empty(timeout=5)
+
+    assert not outbox.contains("1:votecount:10")
+    assert not outbox.contains("1:vhistory:alice")
+
+    ## The rejection survives a restart until it is reported
+    restarted = get_outbox(tmp_path)
+    assert restarted.pop_rejected(1) == ["1:votecount:10"]
+    assert restarted.pop_rejected(1) == []
+
+    assert outbox.pop_rejected(1) == ["1:votecount:10"]
+    forum.rejected = False
+
+    assert outbox.enqueue(key="1:votecount:10", thread_id=1, message="count")
+    assert outbox.wait_until_empty(timeout=5)
+    assert forum.posts == [(1, "count")]
@@ -0,0 +1,56 @@
+import pytest
+
+import modules.replay as replay
+import modules.thread_reader as tr
+from modules.page_cache import PageCache
+
+PAGE = """
+<div class="cf post" data-num="31" data-autor="Alice">
+  <span data-time="1650000000"></span>
+  <div class="post-contents"><h4>Voto Bob</h4></div>
+</div>
+"""
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    recorder = replay.Recorder(str(tmp_path))
+    monkeypatch.setattr(replay, "recorder", recorder)
+    return recorder
+
+
+def get_archive(archive_dir:str, simulated_time:float) -> replay.ReplayArchive:
+    archive = replay.ReplayArchive(archive_dir)
+    archive.get_simulated_time = lambda: simulated_time
+    return archive
+
+
+def test_replay_follows_the_thread_growth(recorder, tmp_path):
+    recorder.record_page("https://mv/thread", "one page", captured_at=100)
+    recorder.record_page("https://mv/thread", "two pages", captured_at=200)
+    recorder.record_page("https://mv/thread/2", "page two", captured_at=200)
+
+    assert get_archive(str(tmp_path), 150).get_page("/thread") == "one page"
+    assert get_archive(str(tmp_path), 250).get_page("/thread") == "two pages"
+    assert get_archive(str(tmp_path), 250).get_page("/thread/2") == "page two"
+
+
+def test_replay_hides_pages_from_the_future(recorder, tmp_path):
+    recorder.record_page("https://mv/thread", "one page", captured_at=100)
+    recorder.record_page("https://mv/thread/2", "page two", captured_at=200)
+
+    assert get_archive(str(tmp_path), 150).get_page("/thread/2") is None
+    assert get_archive(str(tmp_path), 150).get_page("/thread/3") is None
+
+
+def test_capture_archives_cached_pages(recorder, tmp_path, monkeypatch):
+    cache = PageCache(cache_dir=str(tmp_path / "cache"))
+    cache.put("https://mv/thread", 2, [])
+
+    monkeypatch.setattr(tr, "page_cache", cache)
+    monkeypatch.setattr(tr, "get_page_html", lambda url: recorder.record_page(url, PAGE) or PAGE)
+
+    queue = tr.get_actions_from_page(game_thread="https://mv/thread", page_to_scan=2, start_from_post=0)
+
+    assert [action.id for action in queue] == [31]
+    assert get_archive(str(tmp_path), float("inf")).get_page("/thread/2") == PAGE
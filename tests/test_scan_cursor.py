@@ -0,0 +1,28 @@
+from modules.scan_cursor import ScanCursor
+
+
+def test_the_cursor_survives_a_restart(tmp_path):
+    cursor_file = str(tmp_path / "scan_cursor.csv")
+
+    cursor = ScanCursor(file_to_load=cursor_file)
+    assert (cursor.day_start_post, cursor.last_post) == (0, 0)
+
+    cursor.reset(day_start_post=31)
+    cursor.advance(75)
+    cursor.advance(40)
+    cursor.save()
+
+    restarted = ScanCursor(file_to_load=cursor_file)
+
+    assert restarted.is_on_day(31)
+    assert not restarted.is_on_day(76)
+    assert (restarted.last_post, restarted.last_page, restarted.last_valid_action) == (75, 3, 31)
+
+
+def test_a_broken_cursor_starts_from_scratch(tmp_path):
+    cursor_file = tmp_path / "scan_cursor.csv"
+    cursor_file.write_text("day_start_post,last_post\nnot,a number\n")
+
+    cursor = ScanCursor(file_to_load=str(cursor_file))
+
+    assert (cursor.day_start_post, cursor.last_post, cursor.last_page) == (0, 0, 0)
@@ -0,0 +1,54 @@
+from modules.scheduler import PollScheduler
+
+
+def get_scheduler():
+    return PollScheduler(base_interval=60, min_interval=20, max_interval=600)
+
+
+def test_busy_thread_polls_faster():
+    scheduler = get_scheduler()
+    scheduler.set_stage(100)
+
+    scheduler.record_activity(last_post=100, current_time=0)
+    assert scheduler.get_next_interval(current_time=0) == 60
+
+    scheduler.record_activity(last_post=106, current_time=60)
+    assert scheduler.get_next_interval(current_time=60) == 20
+
+
+def test_quiet_thread_backs_off():
+    scheduler = get_scheduler()
+    scheduler.set_stage(100)
+
+    scheduler.record_activity(last_post=100, current_time=0)
+    scheduler.get_next_interval(current_time=0)
+
+    scheduler.record_activity(last_post=100, current_time=60)
+    assert scheduler.get_next_interval(current_time=60) == 90
+
+
+def test_new_day_ignores_the_night_gap():
+    scheduler = get_scheduler()
+
+    ## Day 1, then a long night
+    scheduler.set_stage(100)
+    scheduler.record_activity(last_post=100, current_time=0)
+    scheduler.get_next_interval(current_time=0)
+
+    scheduler.set_stage(400)
+    assert scheduler.get_next_interval(current_time=600, is_idle=True) == 600
+
+    ## First poll of day 2, twelve hours and only a few posts later
+    scheduler.set_stage(420)
+    scheduler.record_activity(last_post=425, current_time=43200)
+    assert scheduler.get_next_interval(current_time=43200) == 60
+
+    scheduler.record_activity(last_post=431, current_time=43260)
+    assert scheduler.get_next_interval(current_time=43260) == 20
+
+
+def test_wakes_up_at_the_end_of_the_stage():
+    scheduler = get_scheduler()
+    scheduler.set_stage(100)
+
+    assert scheduler.get_next_interval(current_time=0, stage_end=30) == 32
@@ -0,0 +1,40 @@
+import pickle
+
+import modules.snapshot as snapshot
+from modules.vote_engine import VoteEngine
+
+
+def get_state() -> dict:
+    votes = VoteEngine()
+    votes.add_vote(player="alice", victim="bob", post_id=11, post_time=0, victim_alias="Bob", voted_as="Alice", bot_cycle=0)
+
+    return {"vote_count": {"votes": votes, "frozen_players": ["carol"]}}
+
+
+def test_the_snapshot_is_saved_with_the_tables(game_store):
+    state = get_state()
+    snapshot.save_snapshot(state)
+    game_store.flush()
+
+    restored = snapshot.load_snapshot()["vote_count"]
+
+    assert restored["frozen_players"] == ["carol"]
+    assert restored["votes"].has_vote("alice", "bob")
+    assert restored["votes"].version != state["vote_count"]["votes"].version
+
+
+def test_rolled_back_snapshots_are_lost(game_store):
+    assert snapshot.load_snapshot() is None
+
+    snapshot.save_snapshot(get_state())
+    game_store.rollback()
+
+    assert snapshot.load_snapshot() is None
+
+
+def test_snapshots_of_another_version_are_ignored(game_store):
+    game_store.save_blob("snapshot", pickle.dumps({"version": snapshot.SNAPSHOT_VERSION - 1, "state": get_state()}))
+    assert snapshot.load_snapshot() is None
+
+    game_store.save_blob("snapshot", b"not a pickle")
+    assert snapshot.load_snapshot() is None
@@ -0,0 +1,50 @@
+import types
+
+import pandas as pd
+
+import user
+from modules.name_registry import NameRegistry
+from modules.vote_engine import VoteEngine
+
+
+def get_user() -> user.User:
+    config = types.SimpleNamespace(game_thread="https://mv/thread", game_master="TheGM", thread_id=1,
+                                   dry_run=True, reveal_day_kill=True)
+    names  = NameRegistry(players=["Alice", "Bob", "Carol"], staff=["thegm"])
+
+    return user.User(config=config, names=names)
+
+
+def test_vote_message_uses_the_display_names():
+    votes = VoteEngine()
+    votes.add_vote(player="alice", victim="bob", post_id=11, post_time=0, victim_alias="Bob", voted_as="Alice", bot_cycle=0)
+
+    message = get_user().generate_vote_message(vote_count=votes.to_dataframe(),
+                                               alive_players=["alice", "bob", "carol"],
+                                               vote_majority=2,
+                                               post_id=11,
+                                               closest_to_majority=(["Bob"], 1))
+
+    assert "**Bob**[/url]: 1 (_Alice_)" in message
+    assert "**No han votado:** Bob, Carol." in message
+    assert "Más cerca de la mayoría: Bob, a 1 voto(s)" in message
+
+
+def test_vote_message_without_votes():
+    message = get_user().generate_vote_message(vote_count=pd.DataFrame(columns=["public_name", "voted_as", "voted_by"]),
+                                               alive_players=["alice"],
+                                               vote_majority=1,
+                                               post_id=3,
+                                               closest_to_majority=([], None))
+
+    assert "**No han votado:** Alice." in message
+    assert "Más cerca de la mayoría" not in message
+
+
+def test_shooting_uses_the_display_names():
+    bot = get_user()
+    bot.queue_shooting(attacker="alice", victim="thegm", is_dead=False, post_id=40)
+
+    assert bot._queue[0].startswith("# ¡Alice tiene un arma!")
+    assert "dispara a GM" in bot._queue[0]
+    assert bot._queue_keys == ["disparo:alice:gm:40"]
@@ -0,0 +1,57 @@
+import modules.game_actions as gm
+import states.action as actions
+import vote_count
+from modules.name_registry import NameRegistry
+from modules.vote_intervals import VoteIntervals
+
+
+def test_votes_alive_at_a_post():
+    intervals = VoteIntervals()
+    intervals.add(row=0, post_id=5, unvoted_at=8, voted_by="alice", player="bob")     # previous day
+    intervals.add(row=1, post_id=12, unvoted_at=0, voted_by="alice", player="bob")
+    intervals.add(row=2, post_id=14, unvoted_at=0, voted_by="bob", player="carol")
+    intervals.add(row=3, post_id=13, unvoted_at=0, voted_by="carol", player="bob")    # out of order
+
+    assert intervals.close(voted_by="alice", player="none", unvoted_at=20, since=10) == 1
+    assert intervals.close(voted_by="alice", player="none", unvoted_at=21, since=10) is None
+
+    assert intervals.alive_at(post_id=11, since=10) == []
+    assert intervals.alive_at(post_id=13, since=10) == [1, 3]
+    assert intervals.alive_at(post_id=19, since=10) == [1, 2, 3]
+    assert intervals.alive_at(post_id=20, since=10) == [2, 3]
+    assert intervals.alive_at(post_id=7, since=1) == [0]
+
+
+def test_replayed_unvotes_end_the_same_vote():
+    intervals = VoteIntervals()
+
+    ## Loaded from the history, already unvoted at post 20
+    intervals.add(row=0, post_id=12, unvoted_at=20, voted_by="alice", player="bob")
+    intervals.add(row=1, post_id=15, unvoted_at=0, voted_by="alice", player="bob")
+
+    assert intervals.close(voted_by="alice", player="bob", unvoted_at=20, since=10) == 0
+    assert intervals.alive_at(post_id=25, since=10) == [1]
+
+
+def test_point_in_time_recount(game_store):
+    names  = NameRegistry(players=["Alice", "Bob", "Carol"], staff=["thegm"])
+    vcount = vote_count.VoteCount(staff=["thegm"], day_start_post=10, bot_cycle=0, n_players=3, names=names)
+
+    for post_id, author, contents in [(11, "alice", "voto bob"), (12, "carol", "voto bob"),
+                                      (13, "alice", "desvoto bob"), (14, "alice", "voto carol")]:
+        action = gm.GameAction(post_id=post_id, post_time=post_id * 60, contents=contents, author=author)
+
+        if action.type == actions.Action.unvote:
+            vcount.unvote_player(action)
+        else:
+            vcount.vote_player(action)
+
+    assert vcount.get_vote_table_at(12)[["voted_by", "player"]].values.tolist() == [["alice", "bob"], ["carol", "bob"]]
+    assert vcount.get_vote_table_at(13)[["voted_by", "player"]].values.tolist() == [["carol", "bob"]]
+    assert vcount.get_vote_table_at(14)[["voted_by", "player"]].values.tolist() == [["carol", "bob"], ["alice", "carol"]]
+
+    ## The history kept in the store gives the same recount after a restart
+    game_store.flush()
+    restarted = vote_count.VoteCount(staff=["thegm"], day_start_post=10, bot_cycle=1, n_players=3, names=names)
+
+    assert restarted.get_vote_table_at(13)[["voted_by", "player"]].values.tolist() == [["carol", "bob"]]
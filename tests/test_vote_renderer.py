@@ -0,0 +1,59 @@
+import pickle
+
+from modules.vote_engine import VoteEngine
+from modules.vote_renderer import VoteRenderer
+
+THREAD = "https://mv/thread"
+
+
+def vote(votes:VoteEngine, player:str, victim:str, post_id:int):
+    votes.add_vote(player=player, victim=victim, post_id=post_id, post_time=0,
+                   victim_alias=victim.title(), voted_as=player.title(), bot_cycle=0)
+
+
+def test_rankings_are_cached_by_vote_version():
+    renderer, votes = VoteRenderer(), VoteEngine()
+    vote(votes, "alice", "bob", 1)
+    vote(votes, "carol", "bob", 2)
+    vote(votes, "bob", "alice", 3)
+
+    ranking = renderer.render_ranking(votes.to_dataframe(), THREAD)
+
+    assert ranking.startswith(f"1. [url={THREAD}?u=Bob]**Bob**[/url]: 2 (_Alice, Carol_)")
+    assert renderer.get_voters(votes.to_dataframe(), THREAD) == {"alice", "bob", "carol"}
+    assert len(renderer._cache) == 1
+
+    votes.remove_oldest_vote("carol")
+    assert "**Bob**[/url]: 1 (_Alice_)" in renderer.render_ranking(votes.to_dataframe(), THREAD)
+    assert len(renderer._cache) == 2
+
+
+def test_every_change_bumps_the_version():
+    votes    = VoteEngine()
+    versions = [votes.version]
+
+    vote(votes, "alice", "bob", 1)
+    versions.append(votes.version)
+
+    votes.replace_player("alice", "dave")
+    versions.append(votes.version)
+
+    votes.remove_player("dave")
+    versions.append(votes.version)
+
+    ## A restored engine never reuses the version of a live one
+    versions.append(pickle.loads(pickle.dumps(votes)).version)
+
+    assert len(set(versions)) == len(versions)
+    assert VoteEngine().version not in versions
+
+
+def test_tables_without_version_are_not_cached():
+    renderer, votes = VoteRenderer(), VoteEngine()
+    vote(votes, "alice", "bob", 1)
+
+    past_table = votes.to_dataframe().copy()
+    past_table.attrs.clear()
+
+    assert "**Bob**[/url]: 1 (_Alice_)" in renderer.render_ranking(past_table, THREAD)
+    assert len(renderer._cache) == 0
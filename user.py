@@ -1,62 +1,90 @@
-'''
-Needed workaround until robobrowser import bug is fixed
-'''
-import werkzeug
-werkzeug.cached_property  = werkzeug.utils.cached_property
-from robobrowser import RoboBrowser
+import hashlib
+import logging
 
 import pandas as pd
 
-import modules.thread_reader as tr
 import modules.game_actions  
+import modules.replay as replay
+from modules.outbox import outbox
+from modules.vote_renderer import renderer
+from modules.history_index import VoteHistoryIndex
+from modules.name_registry import NameRegistry
+
+## Longest message body the bot posts at once. Longer reports are split.
+MAX_MESSAGE_LENGTH = 20000
 
 class User:
 
-    def  __init__(self, config: object):
+    def  __init__(self, config: object, names: NameRegistry = None):
 
-        
-        # Load vote rights table, we need vote visibility info.
-        self.vote_config = pd.read_csv('vote_config.csv', sep=',')
+        # Display names of the players, shared with the vote count
+        self.names = names
 
-        # Attempt to log into MV with these credentials.
-        #TODO: Log errors here
+        # Posts go through the shared outbox
         self.config = config
-        self.browser = self.login(self.config.mediavida_user, self.config.mediavida_pwd)
 
-        # Init internal queue
+        # Init internal queue, and the idempotency keys of its messages
         self._queue      = list()
+        self._queue_keys = list()
 
     def clear_queue(self):
         """Empty the queue of messages to push to the game thread."""
         self._queue.clear()
+        self._queue_keys.clear()
 
 
-    def add_vhistory_to_queue(self, action:modules.game_actions.GameAction, vhistory:pd.DataFrame, victim_is_voter:bool):
+    def add_vhistory_to_queue(self, action:modules.game_actions.GameAction, history_index:VoteHistoryIndex, victim_is_voter:bool):
         """Generate a vhistory message and append it to the queue.
 
         Args:
             action (modules.game_actions.GameAction): Vhistory request action.
-            vhistory (pd.DataFrame): The whole vote history as a pandas dataframe.
+            history_index (VoteHistoryIndex): The index of the whole vote history.
             victim_is_voter (bool): If the action victim is the voter or the voted player.
         """
-        self._message = self.generate_history_message(vhistory=vhistory,
+        self._message = self.generate_history_message(history_index=history_index,
                                                       is_voter=victim_is_voter,
-                                                      player=action.victim,
+                                                      player=self.get_name(action.victim),
                                                       requested_by=action.author)
 
         self._queue.append(self._message)
+        self._queue_keys.append(f"{'historial' if victim_is_voter else 'votantes'}:{action.victim.lower()}:{action.id}")
 
 
     def push_queue(self):
         """Post the whole queue of messages to the game thread."""
 
-        if len(self._queue) > 0:
-            self._resolved_queue = '\n'.join(self._queue)
-            self.post(self._resolved_queue)
-            self.clear_queue()
+        ## Drop the items already queued or sent in another bundle
+        self._new_items = [(message, key) for message, key in zip(self._queue, self._queue_keys)
+                           if not outbox.contains(self._get_outbox_key(key))]
+
+        if len(self._new_items) > 0:
+            self._resolved_queue = '\n'.join(message for message, _ in self._new_items)
+            self._new_keys       = [key for _, key in self._new_items]
+
+            self.post(self._resolved_queue, key="queue:" + "+".join(self._new_keys), item_keys=self._new_keys)
 
+        self.clear_queue()
 
-    def push_votecount(self, vote_count:pd.DataFrame, alive_players:pd.DataFrame, vote_majority:int, post_id:int):
+
+    def push_all_vote_histories(self, history_index:VoteHistoryIndex, players:list, requested_by:str, post_id:int):
+        """Generate the vote history of several players and push it to the game thread,
+        split into as many messages as needed. Skips the queue.
+
+        Args:
+            history_index (VoteHistoryIndex): The index of the whole vote history.
+            players (list): The (lowercased) players to report.
+            requested_by (str): The player requesting the report.
+            post_id (int): The post where the report was requested.
+        """
+        self._messages = self.generate_all_histories_messages(history_index=history_index,
+                                                             players=[self.get_name(player) for player in players],
+                                                             requested_by=requested_by)
+
+        for part, message in enumerate(self._messages):
+            self.post(message, key=f"historiales:{post_id}:{part}")
+
+
+    def push_votecount(self, vote_count:pd.DataFrame, alive_players:pd.DataFrame, vote_majority:int, post_id:int, key:str=None, closest_to_majority:tuple=None):
         """Generate a new vote count message and push it to the game thread. Skips the queue.
 
         Args:
@@ -64,35 +92,59 @@ class User:
             alive_players (int): The number of alive players
             vote_majority (int): The number of votes necessary to reach majority.
             post_id (int): The post number of the last vote.
+            key (str, optional): Idempotency key of the message. Defaults to one vote count per post_id.
+            closest_to_majority (tuple, optional): The players closest to majority and the votes they need, as given by VoteCount.
         """
         
         self._message_to_post = self.generate_vote_message(vote_count=vote_count,
                                                            alive_players=alive_players,
                                                            vote_majority=vote_majority,
-                                                           post_id=post_id)
-        self.post(self._message_to_post)
+                                                           post_id=post_id,
+                                                           closest_to_majority=closest_to_majority)
+        self.post(self._message_to_post, key=key if key is not None else f"votecount:{post_id}")
 
     def push_new_mayor(self, new_mayor:str):
+        new_mayor = self.get_name(new_mayor)
+
         self._header = '# ¡El alcalde del pueblo aparece! \n'
         self._body = f"**¡{new_mayor} se revela para liderar al pueblo!** \n\n"
         self._footer = f"@{new_mayor} desde ahora cuentas con 3 votos. Úsalos con sabiduría."
 
         self._message_to_post = self._header + self._body + self._footer
-        self.post(self._message_to_post)
+        self.post(self._message_to_post, key=f"mayor:{new_mayor.lower()}")
+
+    def push_rejected_posts(self):
+        """Let the GM know about the messages of the game thread the forum rejected.
+        They are queued again the next time the bot needs them.
+        """
+        for outbox_key in outbox.pop_rejected(self.config.thread_id):
+            key = outbox_key.removeprefix(f"{self.config.thread_id}:")
+
+            logging.error(f"The forum rejected the message {key} of {self.config.game_thread}")
+
+            ## A rejected notice is not reported again
+            if key.startswith("rejected:"):
+                continue
+
+            self._message_to_post = f"@{self.config.game_master} El foro ha rechazado uno de mis mensajes ({key}). Lo volveré a publicar si sigue siendo necesario."
+            self.post(self._message_to_post, key=f"rejected:{key}")
 
     def push_welcome_message(self):
         self._message_to_post = self.generate_initial_msg(this_cfg=self.config)
-        self.post(self._message_to_post)
+        self.post(self._message_to_post, key="welcome")
 
-    def queue_shooting(self, attacker:str, victim:str, is_dead:bool, reveal:str="unknown"):
+    def queue_shooting(self, attacker:str, victim:str, is_dead:bool, reveal:str="unknown", post_id:int=0):
         """Push a new shootoing event immediately, skipping the queue
 
         Args:
-            attacker (str): The attacking player.
-            victim (str): The player who has been shot.
+            attacker (str): The (lowercased) attacking player.
+            victim (str): The (lowercased) player who has been shot.
             is_dead (bool): Is the victim dead?
             reveal (str): Role reveal
+            post_id (int, optional): The post where the shot was fired.
         """
+        attacker, victim = self.get_name(attacker), self.get_name(victim)
+
         self._header = f'# ¡{attacker} tiene un arma! \n'
         self._body = f"_¡{attacker} revela un arma y dispara a {victim} ante la atónita mirada de la multitud!_ \n\n"
 
@@ -106,6 +158,7 @@ class User:
 
         self._message_to_post = self._header + self._body + self._footer
         self._queue.append(self._message_to_post)
+        self._queue_keys.append(f"disparo:{attacker.lower()}:{victim.lower()}:{post_id}")
         
     def push_lynch(self, last_votecount: pd.DataFrame, victim:str, post_id:int, reveal=str, is_eod=False):
         """Generate a player lynched message and immediately post it the game thread. Skips the queue.
@@ -130,50 +183,53 @@ class User:
                                                                 post_id=post_id,
                                                                 role=reveal
                                                                 )
-        self.post(self._message_to_post)
+        self.post(self._message_to_post, key=f"{'eod' if is_eod else 'lynch'}:{str(victim).lower()}:{post_id}")
 
 
-    def login(self, user:str, password:str):
-        """Open and resolve mediavida.com login form to log into the bot account.
+    def post(self, message:str, key:str=None, item_keys:list=None):
+        """Queue a message to be posted in the game thread by the outbox worker.
 
         Args:
-            user (str): The user id to log into the account.
-            password (str): The password to log into the account.
+            message (str): The message to post in the game thread.
+            key (str, optional): Idempotency key of the message. Defaults to a hash of the message.
+            item_keys (list, optional): Idempotency keys of the items bundled in the message.
 
         Returns:
-            [Robobrowser]: The resolved form.
+            bool: True if the message was queued, False if it was already queued or sent, None on dry runs.
         """
+        if replay.recorder is not None:
+            replay.recorder.record_post(self.config.thread_id, message)
 
-        self._browser = RoboBrowser(parser="html.parser")
-        self._browser.open('http://m.mediavida.com/login')
-
-        self._login = self._browser.get_form(id='login_form')
-        self._login['name'].value = user
-        self._login['password'].value = password
+        if self.config.dry_run:
+            return None
 
-        self._browser.submit_form(self._login)
+        if key is None:
+            key = "message:" + hashlib.sha1(message.encode("utf-8")).hexdigest()
 
-        return self._browser
+        return outbox.enqueue(key=self._get_outbox_key(key),
+                              thread_id=self.config.thread_id,
+                              message=message,
+                              item_keys=[self._get_outbox_key(item_key) for item_key in item_keys or []])
 
 
-    def post(self, message:str):
-        """Open and resolve the post message form from mediavida.com
+    def get_name(self, player:str) -> str:
+        """Get the display name of a player from the name registry.
 
         Args:
-            message (str): The message to post in the game thread.
+            player (str): The player, in any casing.
 
         Returns:
-            [Robobrowser]: The resolved form.
+            str: The properly cased name, GM for the staff, or player itself if it is unknown.
         """
-        self.browser.open(f'http://www.mediavida.com/foro/post.php?tid={self.config.thread_id}')
-        self._post  = self.browser.get_form(id='postear')
-        self._post['cuerpo'].value = message
-        
-        self.browser.submit_form(self._post)
-        
-        return self.browser.url
+        return self.names.get(player, player) if self.names is not None else player
+
+
+    def _get_outbox_key(self, key:str) -> str:
+        """Scope an idempotency key to the game thread, as several games share the outbox."""
+        return f"{self.config.thread_id}:{key}"
+
         
-    def generate_vote_message(self, vote_count: pd.DataFrame, alive_players: pd.DataFrame, vote_majority:int, post_id:int) -> str:
+    def generate_vote_message(self, vote_count: pd.DataFrame, alive_players: pd.DataFrame, vote_majority:int, post_id:int, closest_to_majority:tuple=None) -> str:
         """Generate a formatted Markdown message representing the vote count results.
 
         Args:
@@ -181,6 +237,7 @@ class User:
             alive_players (int): The number of alive players.
             vote_majority (int): The current number of votes to reach abs.majority.
             post_id (int): The post id of the last vote parsed in the vote_count.
+            closest_to_majority (tuple, optional): The players closest to majority and the votes they need. Not shown if None.
 
         Returns:
             str: A string formatted in Markdown suitable to be posted as a new message in mediavida.com
@@ -188,7 +245,8 @@ class User:
 
         self._header = "# Recuento de votos \n"
         self._votes_rank  = self.generate_string_from_vote_count(vote_count)
-        self._non_voters = list(set(alive_players) - set(vote_count["voted_by"].values.tolist()))
+        self._voters     = renderer.get_voters(vote_count, self.config.game_thread)
+        self._non_voters = [self.get_name(player) for player in alive_players if player not in self._voters]
         self._non_voters = ", ".join(self._non_voters)
 
         self._non_voters_msg = (f"1. **No han votado:** {self._non_voters}.\n")
@@ -196,6 +254,10 @@ class User:
         self._updated = (f'_Actualizado hasta el mensaje: {post_id}._ \n \n')
         self._bot_ad  = "**Soy un bot de recuento automático. Por favor, no me cites _¡N'wah!_** \n"
 
+        if closest_to_majority is not None and len(closest_to_majority[0]) > 0:
+            self._closest_players, self._votes_left = closest_to_majority
+            self._footer += f'_Más cerca de la mayoría: {", ".join(self._closest_players)}, a {self._votes_left} voto(s)._ \n'
+
         self._message  = self._header + self._votes_rank  + self._non_voters_msg + "\n" + self._footer + self._updated + self._bot_ad
 
         return self._message
@@ -278,33 +340,14 @@ class User:
             str: A string formatted in Markdown table suited to be posted in mediavida.com
         """
 
-        self._vote_table = vote_table
-
-        self._vote_count = self._vote_table['public_name'].value_counts().sort_values(ascending=False)
-        self._vote_rank = ''
+        return renderer.render_ranking(vote_table, self.config.game_thread)
 
-        for i in range(0, len(self._vote_count)):
 
-            self._player = self._vote_count.index[i]
-            self._votes  = self._vote_count[i]
-            
-            self._voters  = self._vote_table.loc[self._vote_table['public_name'] == self._player, 'voted_as'].tolist()
-            self._voters  = ', '.join(self._voters)
-
-            if self._player == 'no_lynch':
-                self._player = 'No linchamiento'
-
-            self._vote_string  =  f'1. [url={self.config.game_thread}?u={self._player}]**{self._player}**[/url]: {self._votes} (_{self._voters}_) \n'  
-            self._vote_rank    = self._vote_rank + self._vote_string
-
-        return self._vote_rank
-
-
-    def generate_history_message(self, vhistory:pd.DataFrame, is_voter:bool, player:str, requested_by:str) ->str:
+    def generate_history_message(self, history_index:VoteHistoryIndex, is_voter:bool, player:str, requested_by:str) ->str:
         """Generate a vote history report as a Markdown formatted string to be posted in mediavida.com
 
         Args:
-            vhistory (pd.DataFrame): The current history of votes from the start of the game.
+            history_index (VoteHistoryIndex): The index of the vote history from the start of the game.
             is_voter (bool): If the report is from a player casted votes or the votes casted to the player.
             player (str): The player from which to generate the report.
             requested_by (str): The player requesting the report.
@@ -315,52 +358,74 @@ class User:
 
         #TODO: Consider an enumerator in the future
         if is_voter:
-
             self._header  = f'# Historial de votos de {player}\n'
-            self._column_to_search = 'voted_as'
-            self._target_column    = 'public_name'
         else:
             self._header = f'# Historial de votantes de {player}\n'
-            self._column_to_search = 'public_name'
-            self._target_column    = 'voted_as'
 
-        ## check if the provided name has been voted. 
-        self._matches = vhistory[self._column_to_search].str.contains(player, case=False)
-        self._votes   = vhistory[self._matches].copy()
+        self._markdown_table = self.generate_history_table(history_index=history_index, is_voter=is_voter, player=player)
 
-        if len(self._votes.index) == 0:
-            self._markdown_table = 'No se han encontrado votos.\n'
-        else:
-            self._votes['post_link'] = [f'[{x}]({self.config.game_thread}/{tr.get_page_number_from_post(x)}#{x})' for x in self._votes['post_id']]
+        self._footer  = f'Solicitado por @{requested_by}'
+        self._message = self._header + self._markdown_table + self._footer
+        return self._message
 
-            # For each player, create a column of type list with all the posts where they have been voted
-            self._votes_post_id = self._votes.groupby(self._target_column)['post_link'].apply(list).reset_index(name='posts')
 
-            # Cast the list to str by joining each of them
-            self._votes_post_id['posts'] = self._votes_post_id['posts'].apply(lambda x: ','.join(map(str, x)))
+    def generate_all_histories_messages(self, history_index:VoteHistoryIndex, players:list, requested_by:str) -> list:
+        """Generate a vote history report for several players, as messages no longer than MAX_MESSAGE_LENGTH.
 
-            # Transform said dataframe  to a dict, where keys are players and values a list of posts
-            self._votes_post_id = self._votes_post_id.set_index(self._target_column)['posts'].to_dict()
+        Args:
+            history_index (VoteHistoryIndex): The index of the vote history from the start of the game.
+            players (list): The players to report, properly cased.
+            requested_by (str): The player requesting the report.
 
-            # Count how many votes each player had
-            self._vote_history = self._votes[self._target_column].value_counts()
-            self._vote_history = pd.DataFrame(self._vote_history)
+        Returns:
+            list: The Markdown messages. A single player section is never split.
+        """
+        self._header   = '# Historial de votos de todos los jugadores\n'
+        self._footer   = f'Solicitado por @{requested_by}'
+        self._sections = [f'## {player}\n' + self.generate_history_table(history_index=history_index, is_voter=True, player=player) + '\n'
+                          for player in players]
 
-            # Rename columns and the index
-            self._vote_history.columns       = ['Votos']
-            self._vote_history.index.names   = ['Jugador']
+        self._messages = [self._header]
 
-            # Add the messages column
-            self._vote_history['Votado en'] = self._vote_history.index.map(self._votes_post_id)
+        for section in self._sections:
+            if len(self._messages[-1]) + len(section) + len(self._footer) > MAX_MESSAGE_LENGTH and self._messages[-1] != self._header:
+                self._messages.append(self._header)
 
-            # Requires pip/conda package tabulate
-            self._markdown_table = self._vote_history.to_markdown(numalign='center', stralign='center') + '\n'
+            self._messages[-1] += section
 
-            del self._votes
+        if len(self._messages) > 1:
+            self._messages = [message.replace(self._header, f'# Historial de votos de todos los jugadores ({part + 1}/{len(self._messages)})\n', 1)
+                              for part, message in enumerate(self._messages)]
 
-        self._footer  = f'Solicitado por @{requested_by}'
-        self._message = self._header + self._markdown_table + self._footer
-        return self._message
+        return [message + self._footer for message in self._messages]
+
+
+    def generate_history_table(self, history_index:VoteHistoryIndex, is_voter:bool, player:str) -> str:
+        """Generate the Markdown table of a vote history report.
+
+        Args:
+            history_index (VoteHistoryIndex): The index of the vote history from the start of the game.
+            is_voter (bool): If the report is from a player casted votes or the votes casted to the player.
+            player (str): The player from which to generate the report.
+
+        Returns:
+            str: A Markdown table with the votes and the posts where they were casted.
+        """
+        self._grouped_votes = history_index.get_votes(player=player, is_voter=is_voter)
+
+        if len(self._grouped_votes) == 0:
+            return 'No se han encontrado votos.\n'
+
+        # One row per player, with the links to every post where they voted or were voted
+        self._vote_history = pd.DataFrame({
+            'Votos': [len(anchors) for _, anchors in self._grouped_votes],
+            'Votado en': [','.join(f'[{post_id}]({self.config.game_thread}/{anchor})' for post_id, anchor in anchors)
+                          for _, anchors in self._grouped_votes]
+            },
+            index=pd.Index([other_player for other_player, _ in self._grouped_votes], name='Jugador'))
+
+        # Requires pip/conda package tabulate
+        return self._vote_history.to_markdown(numalign='center', stralign='center') + '\n'
 
 
     def generate_initial_msg(self, this_cfg: object) -> str:
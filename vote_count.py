@@ -1,29 +1,45 @@
+import collections
 import math
 
 import logging
 import pandas as pd
 
 import modules.game_actions as gm
+from modules.vote_engine import VoteEngine, VOTE_COLUMNS
+from modules.vote_intervals import VoteIntervals
+from modules.history_index import VoteHistoryIndex
+from modules.name_registry import NameRegistry
+from modules.game_store import store
+
+## Vote history columns identifying a vote. bot_cycle and unvoted_at are left out.
+HISTORY_KEY_COLUMNS = ["player", "public_name", "voted_by", "voted_as", "post_id", "post_time"]
 
 class  VoteCount:
 
-    def __init__(self, staff:list, day_start_post:int, bot_cycle:int, n_players: int):
+    def __init__(self, staff:list, day_start_post:int, bot_cycle:int, n_players: int, names: NameRegistry):
 
         # Initialize empty vote table
-        self._vote_table = pd.DataFrame(columns=["player",
-        "public_name", "voted_by", 
-        "voted_as", "post_id",
-        "post_time", "bot_cycle"])
+        self._votes = VoteEngine()
     
         try:
-            self._vote_history = pd.read_csv("vote_history.csv", sep=",")
+            self._history_table = store.load_table("vote_history")
+            self._history_table["unvoted_at"] = self._history_table["unvoted_at"].fillna(0)
         except:
             logging.info('Failed to load vote history. Starting from scratch...')
-            self._vote_history = self._vote_table.copy()
-            self._vote_history["unvoted_at"] = 0
+            self._history_table = pd.DataFrame(columns=VOTE_COLUMNS)
+            self._history_table["unvoted_at"] = 0
+            store.create_table("vote_history", self._history_table)
+
+        # Store row ids of the history rows. The table itself is indexed by position.
+        self._history_rowids = self._history_table.index.tolist()
+        self._history_table  = self._history_table.reset_index(drop=True)
+
+        # New history rows are buffered and only concatenated when the table is read
+        self._pending_history = list()
+        self._build_history_index()
 
         # Load vote rights table
-        self.vote_rights = pd.read_csv('vote_config.csv', sep=',')
+        self.vote_rights = store.load_table("vote_config").reset_index(drop=True)
 
         ## Check if no_lynch row is present. Add it if missing, but keep it disabled.
         if 'no_lynch' not in self.vote_rights['player'].values:
@@ -40,11 +56,19 @@ class  VoteCount:
         else:
             self.mayor = None
 
+        self._set_lynch_modifiers()
+
         self.staff = staff
 
+        # Display names, shared with the players and the bot messages
+        self.names = names
+
         self.lynched_player = ''
         self.bot_cycle      = bot_cycle
 
+        # Set once the day has a lynch or reached its end, even if it is not posted yet
+        self.majority_reached = False
+
         # Frozen vote players
         self.frozen_players = list() 
 
@@ -54,6 +78,90 @@ class  VoteCount:
         self.day_start_post = day_start_post
         
 
+    @property
+    def _vote_table(self) -> pd.DataFrame:
+        """The current votes as a DataFrame, built on demand for rendering."""
+        return self._votes.to_dataframe()
+
+
+    @property
+    def _vote_history(self) -> pd.DataFrame:
+        """The whole vote history as a DataFrame, including the buffered rows."""
+        if len(self._pending_history) > 0:
+            self._new_rows        = pd.DataFrame(self._pending_history, columns=VOTE_COLUMNS + ["unvoted_at"])
+            self._history_table   = pd.concat([self._history_table, self._new_rows], ignore_index=True)
+            self._pending_history = list()
+
+        return self._history_table
+
+
+    def get_day_state(self) -> dict:
+        """Get the state of the current day that is not kept in the game tables:
+        the current votes, the frozen players, the LyLo lock and whether the day
+        already ended. The vote history
+        and the vote rights are reloaded from the game store instead.
+
+        Returns:
+            dict: The day state, to be restored with set_day_state.
+        """
+        return {"votes":          self._votes,
+                "frozen_players": self.frozen_players,
+                "locked_unvotes": self.locked_unvotes,
+                "lynched_player": self.lynched_player,
+                "majority_reached": self.majority_reached}
+
+
+    def set_day_state(self, day_state:dict):
+        """Restore the day state saved by get_day_state.
+
+        Args:
+            day_state (dict): The saved day state.
+        """
+        self._votes         = day_state["votes"]
+        self.frozen_players = day_state["frozen_players"]
+        self.locked_unvotes = day_state["locked_unvotes"]
+        self.lynched_player = day_state["lynched_player"]
+        self.majority_reached = day_state["majority_reached"]
+
+        ## The vote rights may have been edited since the day state was saved
+        self._set_lynch_modifiers()
+
+
+    def get_vote_table_at(self, post_id:int) -> pd.DataFrame:
+        """Rebuild the vote table of the current day as it was at a given post.
+
+        Args:
+            post_id (int): The post to look at.
+
+        Returns:
+            pd.DataFrame: The vote history rows of the votes alive at post_id.
+        """
+        self._alive_rows = self._vote_intervals.alive_at(post_id=post_id, since=self.day_start_post)
+
+        return self._vote_history.loc[self._alive_rows]
+
+
+    def get_voters(self) -> list:
+        """Get the players with at least one current vote.
+
+        Returns:
+            list: The (lowercased) voting players.
+        """
+        return self._votes.get_voters()
+
+
+    def count_votes_since(self, post_id:int) -> int:
+        """Count the current votes casted after a given post.
+
+        Args:
+            post_id (int): The post to count from.
+
+        Returns:
+            int: The number of current votes casted after post_id.
+        """
+        return self._votes.count_votes_since(post_id)
+
+
     def player_exists(self, player:str) -> bool:
         """Check if a given player is in the vote_rights table. 
 
@@ -75,13 +183,7 @@ class  VoteCount:
         Returns:
             dict: A dict with lowercased player names as keys and properly cased names as values.
         """
-
-        self._real_names  = self.vote_rights['player'].to_dict()
-        self._staff_to_gm = {self._staff.lower(): 'GM' for self._staff in self.staff}
-        self._real_names.update(self._staff_to_gm)
-        self._real_names.update({'no_lynch':'No linchamiento'})
-
-        return self._real_names
+        return self.names.to_dict()
 
 
     def get_vote_majority(self, n_players:int) -> int:
@@ -111,7 +213,7 @@ class  VoteCount:
         Returns:
             int: The number of valid votes casted by said player.
         """
-        self._player_current_votes = len(self._vote_table[self._vote_table['voted_by'] == player])
+        self._player_current_votes = self._votes.count_votes_by(player)
 
         return self._player_current_votes
 
@@ -125,7 +227,7 @@ class  VoteCount:
         Returns:
             int: The number of valid votes casted on said player.
         """        
-        self._lynch_votes = len(self._vote_table[self._vote_table['player'] == victim])
+        self._lynch_votes = self._votes.count_votes_on(victim)
 
         return self._lynch_votes
         
@@ -159,17 +261,15 @@ class  VoteCount:
             ## Get the real MV names, with the proper casing, and the GM
             ## alias for staffers
 
-            self._names_to_use = self.get_real_names()
-
             ## By default, set the author and victim to the action lowercased ids
             self._voter_real_name  = action.author
-            self._victim_real_name = self._names_to_use[action.victim]
+            self._victim_real_name = self.names[action.victim]
 
             ## If a member from the staff uses an alias, overwrite any author name.
             if action.author in self.staff and action.author != action.alias:
                 self._voter_real_name = action.alias
             else:
-                self._voter_real_name = self._names_to_use[action.author]
+                self._voter_real_name = self.names[action.author]
 
             self._append_vote(player=action.author,
                               victim=action.victim,
@@ -203,17 +303,42 @@ class  VoteCount:
             bool: True if the player should be lynched.  False otherwise.
         """
         self._lynched = False
-        
-        # Count this player votes
-        self._lynch_votes     = self.get_victim_current_votes(victim)
-        self._player_majority = self.current_majority + self.get_player_mod_to_lynch(victim)
 
-        if self._lynch_votes >= self._player_majority:
+        if self.get_votes_to_lynch(victim) <= 0:
             self._lynched = True
         
         return self._lynched
 
         
+    def get_votes_to_lynch(self, victim:str) -> int:
+        """Get how many votes a player still needs to be lynched, including
+        their lynch modifier.
+
+        Args:
+            victim (str): The (lowercased) player.
+
+        Returns:
+            int: The votes left to reach majority. Zero or less means lynched.
+        """
+        return self.current_majority + self.get_player_mod_to_lynch(victim) - self.get_victim_current_votes(victim)
+
+
+    def get_closest_to_majority(self) -> tuple:
+        """Get the voted players needing the fewest votes to be lynched, as
+        kept by the vote leaderboard. Nothing is recounted.
+
+        Returns:
+            tuple: The public names of the closest players and the votes they still need.
+            ([], None) if there are no votes.
+        """
+        self._closest, self._closest_votes = self._votes.leaderboard.get_closest_to_majority()
+
+        if len(self._closest) == 0:
+            return ([], None)
+
+        return ([self._votes.get_public_name(victim) for victim in self._closest], self.current_majority - self._closest_votes)
+
+
     def is_valid_vote(self, player:str, victim:str) -> bool:
         """Evaluate if a given vote is valid. A valid vote has to fulfill the following
         requirements:
@@ -290,19 +415,13 @@ class  VoteCount:
         if player in self.frozen_players:
             return self._is_valid_unvote
         
-        if player in self._vote_table['voted_by'].values:
-
-            if self.get_player_current_votes(player) >  0:
-
-                if victim == 'none':
-                    self._is_valid_unvote = True
-                    
-                else: 
-                    # Get all casted voted to said victim by player
-                    self._casted_votes = self._vote_table[(self._vote_table['player'] == victim ) & (self._vote_table['voted_by'] == player)]
+        if self.get_player_current_votes(player) >  0:
 
-                    if len(self._casted_votes) > 0: 
-                        self._is_valid_unvote = True
+            if victim == 'none':
+                self._is_valid_unvote = True
+                
+            elif self._votes.has_vote(player, victim):
+                self._is_valid_unvote = True
     
         return self._is_valid_unvote
 
@@ -320,8 +439,7 @@ class  VoteCount:
         if self.player_exists(player=replaced):
 
             ## Update the votetable. This is run-safe.
-            self._vote_table.loc[self._vote_table['player'] == replaced, ['player', 'public_name']]  = replaced_by
-            self._vote_table.loc[self._vote_table['voted_by'] == replaced, ['voted_by', 'voted_as']] = replaced_by
+            self._votes.replace_player(replaced=replaced, replaced_by=replaced_by)
 
             ## Update the vote rights, do not edit it. It would invalidate the votes casted to the replaced
             ## player on the next run.
@@ -346,11 +464,7 @@ class  VoteCount:
         """
         if self.player_exists(player=player_to_remove):
 
-            self._votes_by_player = self._vote_table['player'] == player_to_remove
-            self._voted_by_player = self._vote_table['voted_by'] == player_to_remove
-
-            self._entries_to_drop = self._vote_table[self._votes_by_player | self._voted_by_player].index
-            self._vote_table.drop(self._entries_to_drop, axis=0, inplace=True)
+            self._votes.remove_player(player_to_remove)
 
             logging.info(f'Remove:{player_to_remove}')
         else:
@@ -398,7 +512,7 @@ class  VoteCount:
 
             if self._old_limit != self._new_limit:
                 self.vote_rights.loc[player, 'allowed_votes'] = self._new_limit
-                self.vote_rights.to_csv("vote_config.csv", sep=",", index=False, header=True)
+                store.update_rows("vote_config", values={"allowed_votes": self._new_limit}, where={"player": self.vote_rights.loc[player, "player"]})
             else:
                 logging.info(f"Ignoring vote rights update for player {player}")
         else:
@@ -412,7 +526,7 @@ class  VoteCount:
             str: Player to lynch
         """
         
-        self._most_voted = self._vote_table["public_name"].value_counts().sort_values(ascending=False)
+        self._most_voted = self._votes.leaderboard.get_leaders()
 
         if len(self._most_voted) == 0:
             # Is no lynch allowed?
@@ -422,15 +536,14 @@ class  VoteCount:
                 return "no_lynch"
             else:
                 return None
+
+        ## There is at least one tie. Do not RNG, default to none
+        elif len(self._most_voted) > 1:
+            return None
         else:
-            ## There is at least one tie. Do not RNG, default to none
-            if self._most_voted.iloc[0] == self._most_voted.iloc[1]:
-                return None 
-            else:
-                return self._most_voted.index[0]
+            return self._votes.get_public_name(self._most_voted[0])
 
 
-    #TODO: Awful function, fix it
     def _append_vote(self, player:str, victim:str, post_id:int, post_time:int, victim_alias:str, voted_as:str):
         """Append a new vote to the vote count.
 
@@ -442,16 +555,15 @@ class  VoteCount:
             victim_alias (str): The real name (properly cased) of the player receiving the vote.
             voted_as (str): The vote alias of the player casting the v ote.
         """
-        self._vote_table  = self._vote_table.append({'player': victim,
-                                                    'voted_by': player,
-                                                    'post_id': post_id,
-                                                    'post_time': post_time,
-                                                    'public_name': victim_alias,
-                                                    'voted_as': voted_as,
-                                                    'bot_cycle': self.bot_cycle},
-                                                    ignore_index=True)
+        self._new_vote = self._votes.add_vote(player=player,
+                                              victim=victim,
+                                              post_id=post_id,
+                                              post_time=post_time,
+                                              victim_alias=victim_alias,
+                                              voted_as=voted_as,
+                                              bot_cycle=self.bot_cycle)
         
-        self._update_vote_history()
+        self._update_vote_history(last_vote=self._new_vote)
         logging.info(f'{player} voted {victim} at {post_id}')
 
 
@@ -463,69 +575,95 @@ class  VoteCount:
             player (str): The player who removes the vote.
             victim (str): The unvoted player. Can be set to "none" to remove the oldest vote no matter the victim.
         """
-        if victim == 'none': ## Remove the oldest vote
-            self._old_vote = self._vote_table[self._vote_table['voted_by'] == player].index[0]
-        else:
-            self._old_vote = self._vote_table[(self._vote_table['player'] == victim) & (self._vote_table['voted_by'] == player)].index[0]
-        
         ## Always remove the oldest vote casted and update vhistory
+        ## victim = "none" removes the oldest vote no matter the victim.
         self._set_unvote_to_history(player = player, victim = victim, unvote_post_id = unvote_post)
-        self._vote_table.drop(self._old_vote, axis=0, inplace=True)
+        self._votes.remove_oldest_vote(player=player, victim=victim)
         
         logging.info(f'{player} unvoted {victim}.')
     
     def _set_unvote_to_history(self, player:str, victim:str, unvote_post_id):
 
-        self._unvote = self._vote_history.loc[
-            (self._vote_history["voted_by"] == player) & 
-            (self._vote_history["unvoted_at"] == 0) & 
-            (self._vote_history["post_id"] <= unvote_post_id) &
-            (self._vote_history["post_id"] >= self.day_start_post)
-            ]
-        
-        if victim != "none":
-            self._unvote = self._unvote.loc["player" == victim]
-        
-        self._sorted_unvotes = self._unvote.sort_values("bot_cycle")
-
-        ## If self._unvote is empty, then we have nothing to update
+        ## The oldest alive vote of the day is the one removed
         ## If more than one result, it's a multi vote in the same post
-        if len(self._sorted_unvotes) == 0:
+        self._unvoted_row = self._vote_intervals.close(voted_by=player,
+                                                       player=victim,
+                                                       unvoted_at=unvote_post_id,
+                                                       since=self.day_start_post)
+
+        ## If there is no such vote, then we have nothing to update
+        if self._unvoted_row is None:
             return
+
+        store.update_rows("vote_history", values={"unvoted_at": unvote_post_id}, where={"rowid": self._history_rowids[self._unvoted_row]})
+
+        if self._unvoted_row < len(self._history_table):
+            self._history_table.loc[self._unvoted_row, "unvoted_at"] = unvote_post_id
         else:
-            self._vote_history.loc[self._sorted_unvotes.index[0], "unvoted_at"] = unvote_post_id
-            logging.info(f"Add unvote to history at {unvote_post_id} for {player} unvoting {victim}")
+            self._pending_history[self._unvoted_row - len(self._history_table)]["unvoted_at"] = unvote_post_id
+
+        logging.info(f"Add unvote to history at {unvote_post_id} for {player} unvoting {victim}")
 
-    def _update_vote_history(self):
+    def _update_vote_history(self, last_vote:dict):
         """Attempt to update the vote history with the last vote from the vote table.
            Any vote already present will be skipped.
+
+        Args:
+            last_vote (dict): The last vote appended to the vote table.
+        """
+        # Check for a perfect match in all columns but bot_cycle and unvote
+        self._history_key    = self._get_history_key(last_vote)
+        self._history_cycles = self._history_keys.get(self._history_key)
+
+        ## Two votes sharing every column and cycle come from the same user double voting
+        if self._history_cycles is None or self.bot_cycle in self._history_cycles:
+            self._vote_intervals.add(row=len(self._history_table) + len(self._pending_history),
+                                     post_id=last_vote["post_id"],
+                                     unvoted_at=0,
+                                     voted_by=last_vote["voted_by"],
+                                     player=last_vote["player"])
+
+            self._pending_history.append({**last_vote, "unvoted_at": 0})
+            self._history_rowids.append(store.insert_row("vote_history", self._pending_history[-1]))
+            self.history_index.add(voted_as=last_vote["voted_as"], public_name=last_vote["public_name"], post_id=last_vote["post_id"])
+            self._history_keys[self._history_key].add(last_vote["bot_cycle"])
+
+
+    def _build_history_index(self):
+        """Index the bot cycles of the vote history by vote key, so that
+        duplicated votes are found without scanning the history, and the
+        lifetime of every vote for point-in-time vote counts.
         """
+        self._history_keys   = collections.defaultdict(set)
+        self._vote_intervals = VoteIntervals()
+        self.history_index   = VoteHistoryIndex()
 
-        self._last_vote        = self._vote_table.iloc[-1,:]
+        history_rows = zip(self._history_table["post_id"], self._history_table["unvoted_at"],
+                           self._history_table["voted_by"], self._history_table["player"])
 
-        if len(self._vote_history) > 0:
-            self._columns_to_check = ['player', 'public_name',
-                                      'voted_by','voted_as',
-                                      'post_id','post_time']
+        for row, (post_id, unvoted_at, voted_by, player) in enumerate(history_rows):
+            self._vote_intervals.add(row=row, post_id=post_id, unvoted_at=unvoted_at, voted_by=voted_by, player=player)
 
-            # Check for a perfect match in all columns but bot_cycle and unvote
-            self._already_appended = self._vote_history[self._columns_to_check] == self._last_vote[self._columns_to_check]
-            self._already_appended = self._already_appended.all(axis=1)
-    
-            self._same_cycle       = (self._vote_history[self._already_appended]['bot_cycle']  == self.bot_cycle).any()
-            self._already_appended = self._already_appended.any()
+        history_keys = zip(*[self._history_table[column] for column in HISTORY_KEY_COLUMNS])
+
+        for vote_key, cycle in zip(history_keys, self._history_table["bot_cycle"]):
+            self._history_keys[self._get_history_key(dict(zip(HISTORY_KEY_COLUMNS, vote_key)))].add(cycle)
+
+        for voted_as, public_name, post_id in zip(self._history_table["voted_as"], self._history_table["public_name"], self._history_table["post_id"]):
+            self.history_index.add(voted_as=voted_as, public_name=public_name, post_id=post_id)
+
+
+    def _set_lynch_modifiers(self):
+        """Pass the lynch modifier of every player to the vote leaderboard."""
+        for player, modifier in self.vote_rights["mod_to_lynch"].items():
+            self._votes.leaderboard.set_modifier(player, int(modifier))
 
-            ## Two votes sharing every column and cycle come from the same user double voting
-            if not self._already_appended or (self._already_appended and self._same_cycle):
-                self._vote_history = self._vote_history.append(self._last_vote, ignore_index=True) 
-        else:
-            self._vote_history = self._vote_history.append(self._last_vote, ignore_index=True)
-        
-        self._vote_history["unvoted_at"] = self._vote_history["unvoted_at"].fillna(0)
 
-    def save_vote_history(self):
-        """Save the vote history to a file called vote_history.csv"""
-        self._vote_history.to_csv('vote_history.csv', sep=',', index=False)
+    def _get_history_key(self, vote:dict) -> tuple:
+        """Get the hashable key of a vote: every column but bot_cycle and unvoted_at."""
+        return (str(vote["player"]), str(vote["public_name"]),
+                str(vote["voted_by"]), str(vote["voted_as"]),
+                int(vote["post_id"]), int(vote["post_time"]))
 
 
     def _append_to_vote_rights(self, player:str, based_on_player:str):
@@ -548,9 +686,9 @@ class  VoteCount:
 
         # Append it to the end of the vote rights table
         self.vote_rights = self.vote_rights.append(self._new_vote_rights)
+        self.names.add(player)
+        self._votes.leaderboard.set_modifier(player.lower(), int(self._old_player["mod_to_lynch"]))
 
-        # Just in case the bot closes, let's update the vote_rights. 
-        #TODO: Find  a better way to do this. 
-        logging.info(f'Updated vote_rights.csv with {player}')
-        self.vote_rights.to_csv('vote_config.csv', sep=',', index=False, header=True)
+        store.insert_row("vote_config", self._old_player)
+        logging.info(f'Updated vote rights with {player}')
 